@@ -8,11 +8,14 @@ import os
 import logging
 
 from celery import Celery
+from celery.signals import worker_process_init
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ccxcon.settings')
 
 from django.conf import settings
 
+from ccxcon.http_sessions import reset_sessions
+
 log = logging.getLogger(__name__)
 
 async = Celery('ccxcon')
@@ -21,3 +24,11 @@ async = Celery('ccxcon')
 # pickle the object when using Windows.
 async.config_from_object('django.conf:settings')
 async.autodiscover_tasks(lambda: settings.INSTALLED_APPS)  # pragma: no cover
+
+
+@worker_process_init.connect
+def reset_sessions_after_fork(**kwargs):  # pylint: disable=unused-argument
+    """
+    Prefork workers start without the parent's HTTP connections.
+    """
+    reset_sessions()
@@ -0,0 +1,93 @@
+"""
+Pooled HTTP sessions for calls out to edX and to webhooks.
+
+Each process keeps one requests session per named purpose, so calls to the
+same host reuse kept-alive connections instead of opening a new TCP and TLS
+connection each time. Sessions are bounded in how many hosts and
+connections they pool, and give every request a connect and read timeout
+unless it sets its own.
+
+uWSGI and Celery fork their workers from a parent which may already have
+made requests. A child must not share the parent's sockets, so both call
+reset_sessions after forking (see ccxcon.wsgi and ccxcon.celery), and
+sessions are keyed by process id besides, so a forked worker always builds
+its own on first use.
+"""
+import os
+import threading
+
+from django.conf import settings
+import requests
+from requests.adapters import HTTPAdapter
+
+# Sessions by (pid, name).
+_sessions = {}
+_lock = threading.Lock()
+
+
+class TimeoutSession(requests.Session):
+    """
+    Session which applies a default timeout to requests which don't
+    set one.
+    """
+    def __init__(self, timeout):
+        super(TimeoutSession, self).__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):  # pylint: disable=arguments-differ
+        """
+        Sends the request, with the default timeout if none is given.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        return super(TimeoutSession, self).request(method, url, **kwargs)
+
+
+def make_session():
+    """
+    A new session, pooled and timed out as configured in settings.
+    """
+    session = TimeoutSession(
+        (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT))
+    adapter = HTTPAdapter(
+        pool_connections=settings.HTTP_POOL_HOSTS,
+        pool_maxsize=settings.HTTP_POOL_SIZE,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def reset_sessions():
+    """
+    Forgets all sessions, to be called in a newly forked process. Nothing
+    is closed, as the parent still uses its sockets. The lock is replaced
+    too, in case another thread held it at the time of the fork.
+    """
+    global _lock  # pylint: disable=global-statement
+    _lock = threading.Lock()
+    _sessions.clear()
+
+
+def get_session(name):
+    """
+    This process's session for ``name``, created on first use.
+
+    Args:
+        name (str): What the session is for, e.g. 'edx' or 'webhooks'.
+            Each name gets its own pools, so slow webhook endpoints can't
+            hold up calls to edX.
+
+    Returns:
+        requests.Session: The session. Safe to share between threads.
+    """
+    key = (os.getpid(), name)
+    session = _sessions.get(key)
+    if session is None:
+        with _lock:
+            session = _sessions.get(key)
+            if session is None:
+                # Anything inherited from before a fork. See reset_sessions.
+                for stale in [stale for stale in _sessions if stale[0] != key[0]]:
+                    del _sessions[stale]
+                session = _sessions[key] = make_session()
+    return session
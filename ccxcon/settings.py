@@ -15,6 +15,7 @@ import platform
 import yaml
 
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 VERSION = "0.2.0"
 
@@ -92,6 +93,7 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    'courses.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -272,6 +274,49 @@ CELERY_ALWAYS_EAGER = get_var("CELERY_ALWAYS_EAGER", True)
 CELERY_EAGER_PROPAGATES_EXCEPTIONS = get_var(
     "CELERY_EAGER_PROPAGATES_EXCEPTIONS", True)
 
+# Seconds a course's module sync waits for further pushes to fold in, and
+# the longest one is expected to run.
+MODULE_POPULATION_DELAY = get_var('CCXCON_MODULE_POPULATION_DELAY', 30)
+MODULE_POPULATION_TIMEOUT = get_var('CCXCON_MODULE_POPULATION_TIMEOUT', 10 * 60)
+# Parse course blocks as they're downloaded, keeping only what module
+# population needs, rather than loading the whole response.
+MODULE_POPULATION_STREAM_BLOCKS = get_var('CCXCON_MODULE_POPULATION_STREAM_BLOCKS', True)
+
+# Outbound HTTP to edX and webhooks: seconds to wait to connect and between
+# bytes read, hosts pooled per session and connections kept per host.
+HTTP_CONNECT_TIMEOUT = get_var('CCXCON_HTTP_CONNECT_TIMEOUT', 5)
+HTTP_READ_TIMEOUT = get_var('CCXCON_HTTP_READ_TIMEOUT', 60)
+HTTP_POOL_HOSTS = get_var('CCXCON_HTTP_POOL_HOSTS', 10)
+HTTP_POOL_SIZE = get_var('CCXCON_HTTP_POOL_SIZE', 10)
+
+# Shared cache, used for API responses and to coordinate Celery tasks.
+# Defaults to the broker when that's redis. Web and worker processes must
+# share it, so a per-process cache is only used when tasks run eagerly.
+CACHE_URL = get_var('CCXCON_CACHE_URL', get_var('REDISCLOUD_URL', None))
+if not CACHE_URL and BROKER_URL and BROKER_URL.startswith(('redis://', 'rediss://')):
+    CACHE_URL = BROKER_URL
+if not CACHE_URL and not CELERY_ALWAYS_EAGER:
+    raise ImproperlyConfigured(
+        'Set CCXCON_CACHE_URL to a redis URL that the web and Celery '
+        'processes can share.')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'ccxcon',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+# Upper bound on how long a cached API response lives. Writes invalidate
+# sooner than this.
+API_CACHE_TIMEOUT = get_var('CCXCON_API_CACHE_TIMEOUT', 60 * 60)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.BasicAuthentication',
@@ -280,9 +325,33 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
-    )
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'courses.renderers.FastJSONRenderer',
+        'courses.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
+# Default and maximum page sizes for the course catalog listing.
+COURSE_PAGE_SIZE = get_var('CCXCON_COURSE_PAGE_SIZE', 100)
+COURSE_MAX_PAGE_SIZE = get_var('CCXCON_COURSE_MAX_PAGE_SIZE', 1000)
+# Seconds the changes feed stays behind the present, to allow for
+# transactions committing after they saved, and the most rows of each kind
+# one call of it returns.
+CHANGES_FEED_LAG = get_var('CCXCON_CHANGES_FEED_LAG', 60)
+CHANGES_PAGE_SIZE = get_var('CCXCON_CHANGES_PAGE_SIZE', 1000)
+# Most identifiers a single batch lookup of courses may ask for.
+COURSE_BATCH_MAX_SIZE = get_var('CCXCON_COURSE_BATCH_MAX_SIZE', 1000)
+# Most results a course search returns.
+COURSE_SEARCH_LIMIT = get_var('CCXCON_COURSE_SEARCH_LIMIT', 50)
+# Most courses a single bulk push may hold, and the largest body it may
+# decompress to.
+COURSE_BULK_MAX_SIZE = get_var('CCXCON_COURSE_BULK_MAX_SIZE', 1000)
+COURSE_BULK_MAX_BYTES = get_var('CCXCON_COURSE_BULK_MAX_BYTES', 50 * 1024 * 1024)
+# Courses fetched per query while streaming the catalog export.
+EXPORT_BATCH_SIZE = get_var('CCXCON_EXPORT_BATCH_SIZE', 200)
+
 # Token required to access the status page.
 STATUS_TOKEN = get_var(
     'STATUS_TOKEN',
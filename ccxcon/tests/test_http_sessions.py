@@ -0,0 +1,71 @@
+"""
+Tests for the pooled outbound HTTP sessions
+"""
+# pylint: disable=no-self-use
+from django.test import SimpleTestCase
+import mock
+from requests.adapters import HTTPAdapter
+
+from ccxcon import http_sessions
+from ccxcon.http_sessions import get_session, reset_sessions
+
+
+class GetSessionTests(SimpleTestCase):
+    """
+    Tests for get_session
+    """
+    def setUp(self):
+        reset_sessions()
+        self.addCleanup(reset_sessions)
+
+    def test_one_session_per_name(self):
+        """
+        Each name gets its own session, reused from then on
+        """
+        edx = get_session('edx')
+        assert get_session('edx') is edx
+        assert get_session('webhooks') is not edx
+
+    def test_new_session_after_fork(self):
+        """
+        A process with another pid doesn't reuse its parent's sessions,
+        nor do they linger in its registry
+        """
+        parent = get_session('edx')
+        with mock.patch('ccxcon.http_sessions.os.getpid', autospec=True) as m_getpid:
+            m_getpid.return_value = -1
+            child = get_session('edx')
+        assert child is not parent
+        # pylint: disable=protected-access
+        assert list(http_sessions._sessions.values()) == [child]
+
+    def test_reset(self):
+        """
+        Resetting drops all sessions
+        """
+        session = get_session('edx')
+        reset_sessions()
+        assert get_session('edx') is not session
+
+    def test_pool_sizes(self):
+        """
+        Connections are pooled as configured
+        """
+        with self.settings(HTTP_POOL_HOSTS=3, HTTP_POOL_SIZE=4):
+            adapter = get_session('edx').get_adapter('https://edx.org/')
+        assert adapter.poolmanager.connection_pool_kw['maxsize'] == 4
+        assert adapter.poolmanager.connection_pool_kw['block'] is False
+        assert adapter.poolmanager.pools._maxsize == 3  # pylint: disable=protected-access
+
+    def test_default_timeout(self):
+        """
+        Requests time out as configured, unless they say otherwise
+        """
+        with self.settings(HTTP_CONNECT_TIMEOUT=2, HTTP_READ_TIMEOUT=7):
+            session = get_session('edx')
+        with mock.patch.object(HTTPAdapter, 'send', autospec=True) as m_send:
+            m_send.return_value.is_redirect = False
+            session.get('https://edx.org/')
+            assert m_send.call_args[1]['timeout'] == (2, 7)
+            session.get('https://edx.org/', timeout=1)
+            assert m_send.call_args[1]['timeout'] == 1
@@ -9,6 +9,7 @@ import tempfile
 
 from django.conf import settings
 from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase
 import mock
 import semantic_version
@@ -105,6 +106,37 @@ class TestSettings(TestCase):
         mail.mail_admins('Test', 'message')
         self.assertIn(test_admin_email, mail.outbox[0].to)
 
+    def test_shared_cache(self):
+        """Verify the cache falls back to a redis broker, and is always shared with workers"""
+        with mock.patch.dict('os.environ', {
+            'BROKER_URL': 'redis://redis:6379/4',
+        }, clear=True):
+            settings_vars = self.reload_settings()
+            self.assertEqual(settings_vars['CACHES']['default']['LOCATION'],
+                             'redis://redis:6379/4')
+
+        with mock.patch.dict('os.environ', {
+            'BROKER_URL': 'redis://redis:6379/4',
+            'CCXCON_CACHE_URL': 'redis://cache:6379/1',
+        }, clear=True):
+            settings_vars = self.reload_settings()
+            self.assertEqual(settings_vars['CACHES']['default']['LOCATION'],
+                             'redis://cache:6379/1')
+
+        with mock.patch.dict('os.environ', {
+            'BROKER_URL': 'amqp://rabbit//',
+        }, clear=True):
+            settings_vars = self.reload_settings()
+            self.assertEqual(settings_vars['CACHES']['default']['BACKEND'],
+                             'django.core.cache.backends.locmem.LocMemCache')
+
+        with mock.patch.dict('os.environ', {
+            'BROKER_URL': 'amqp://rabbit//',
+            'CELERY_ALWAYS_EAGER': 'False',
+        }, clear=True):
+            with self.assertRaises(ImproperlyConfigured):
+                self.reload_settings()
+
     def test_db_ssl_enable(self):
         """Verify that we can enable/disable database SSL with a var"""
 
@@ -19,6 +19,8 @@ urlpatterns = [
     url(r'^admin/', include(admin.site.urls)),
     url(r'^api/v1/', include(router.urls)),
     url(r'^api/v1/', include(modules_router.urls)),
+    url(r'^api/v1/changes/$', 'courses.views.changes', name='changes'),
+    url(r'^api/v1/export/$', 'courses.views.export', name='export'),
     url(r'^api/v1/user_exists/$', 'courses.views.user_existence', name='user-existence'),
     url(r'^api/v1/ccx/$', 'courses.views.create_ccx', name='create-ccx'),
     url(r'^o/', include('oauth2_provider.urls', namespace='oauth2_provider')),
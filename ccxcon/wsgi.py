@@ -15,6 +15,17 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccxcon.settings")
 
 from whitenoise.django import DjangoWhiteNoise  # noqa
 
+from ccxcon.http_sessions import reset_sessions  # noqa
+
+try:
+    from uwsgidecorators import postfork
+except ImportError:  # pragma: no cover
+    # Not running under uWSGI.
+    pass
+else:  # pragma: no cover
+    # Workers start without the master's HTTP connections.
+    postfork(reset_sessions)
+
 
 application = DjangoWhiteNoise(
     get_wsgi_application()
@@ -0,0 +1,209 @@
+"""
+Reading course structures from the edX course blocks API.
+
+All module_population needs is the chapters and the names of their
+subsections, so it asks for the blocks down to SUBCHAPTER_DEPTH only. A
+``depth=all`` response, which lists every block in the course down to each
+problem and video, is only fetched for courses that don't fit that shape.
+
+For large courses a whole response runs to tens of MB once parsed, so
+parse_blocks reads it as a stream instead and keeps just what's needed:
+the course, its chapters, and the names of the chapters' children.
+"""
+import tempfile
+
+from ijson.common import ObjectBuilder
+try:
+    from ijson.backends import yajl2_c as ijson
+except ImportError:  # pragma: no cover
+    # Without the C extension. Works the same, several times slower.
+    from ijson.backends import python as ijson
+
+# Depth of the blocks fetched: the course, its chapters and their children.
+SUBCHAPTER_DEPTH = 2
+# Blocks kept whole, and the fields of them kept. Chapters become modules,
+# the course lists them in order.
+KEPT_FIELDS = {
+    'course': ('id', 'children'),
+    'chapter': ('id', 'display_name', 'children', 'visible_to_staff_only'),
+}
+# Block types whose names are always kept. edX courses nest sequentials
+# (subsections) directly in chapters, but any children of chapters are named.
+NAMED_TYPES = ('sequential',)
+
+
+def trim_block(block, named_types=NAMED_TYPES):
+    """
+    The parts of a block module_population uses, or None if it uses none.
+    """
+    if not isinstance(block, dict):
+        return None
+    block_type = block.get('type')
+    if block_type in KEPT_FIELDS:
+        return {field: block[field] for field in KEPT_FIELDS[block_type] if field in block}
+    if named_types is None or block_type in named_types:
+        return {'display_name': block.get('display_name')}
+    return None
+
+
+def has_subchapters(response):
+    """
+    Whether a blocks API response has the course's chapters and the names
+    of all of their children.
+    """
+    blocks = response['blocks']
+    course = blocks.get(response['root'])
+    if course is None or 'children' not in course:
+        return False
+    for chapter_id in course['children']:
+        chapter = blocks.get(chapter_id)
+        if chapter is None or 'display_name' not in chapter:
+            return False
+        for child_id in chapter.get('children', ()):
+            if 'display_name' not in blocks.get(child_id, {}):
+                return False
+    return True
+
+
+class SpoolingReader(object):
+    """
+    File-like wrapper which copies all that's read from ``stream`` to
+    ``spool``, for reading it again.
+    """
+    def __init__(self, stream, spool):
+        self.stream = stream
+        self.spool = spool
+
+    def read(self, size=-1):
+        """
+        Reads from the stream, spooling what's read.
+        """
+        data = self.stream.read(size)
+        self.spool.write(data)
+        return data
+
+
+def parse_blocks(stream, named_types=NAMED_TYPES):
+    """
+    Incrementally parses a blocks API response, keeping only what
+    module_population needs. Only one block is held in full at a time.
+
+    Blocks can come in any order, so a chapter's children may be read
+    before it is. The response is spooled to a temporary file as it's read,
+    and read again for the names of any such children.
+
+    Args:
+        stream (file-like): The response body, read with ``read(size)``.
+        named_types (iterable): Types of the blocks to keep the names of,
+            besides chapters and their children, whatever their type.
+            None keeps the names of every block.
+
+    Returns:
+        dict: The response shaped as the API returns it, with ``root`` and
+        the trimmed ``blocks``.
+    """
+    wanted = set()  # Children of the chapters read so far.
+
+    def trim(block_id, block):
+        """
+        Trims a block, keeping the name of any child of a chapter read
+        before it.
+        """
+        trimmed = trim_block(block, named_types)
+        if trimmed is None and block_id in wanted:
+            trimmed = trim_block(block, None)
+        if trimmed is not None and block.get('type') == 'chapter':
+            wanted.update(trimmed.get('children', ()))
+        return trimmed
+
+    with tempfile.TemporaryFile() as spool:
+        response = read_response(SpoolingReader(stream, spool), trim)
+        blocks = response['blocks']
+        missing = {
+            child_id
+            for chapter_id in blocks.get(response['root'], {}).get('children', ())
+            for child_id in blocks.get(chapter_id, {}).get('children', ())
+            if child_id not in blocks
+        }
+        if missing:
+            spool.seek(0)
+            blocks.update(read_response(
+                spool, lambda block_id, block: (
+                    trim_block(block, None) if block_id in missing else None)
+            )['blocks'])
+    return response
+
+
+def read_response(stream, trim):
+    """
+    Parses a blocks API response, building one block at a time.
+
+    Args:
+        stream (file-like): The response body, read with ``read(size)``.
+        trim (callable): Called with each block's id and the block, returns
+            what to keep of it, or None to drop it.
+
+    Returns:
+        dict: The ``root`` and the trimmed ``blocks``.
+    """
+    root = None
+    blocks = {}
+    key = None  # Key in the response object.
+    events = iter(ijson.basic_parse(stream))
+
+    for event, value in events:
+        if event == 'map_key':
+            key = value
+        elif event == 'start_map' and key == 'blocks':
+            for block_id, block in iter_blocks(events):
+                trimmed = trim(block_id, block)
+                if trimmed is not None:
+                    blocks[block_id] = trimmed
+        elif event in ('start_map', 'start_array') and key is not None:
+            # Some other structured field, skipped over.
+            for _ in value_events(events):
+                pass
+        elif event == 'string' and key == 'root':
+            root = value
+
+    return {'root': root, 'blocks': blocks}
+
+
+def iter_blocks(events):
+    """
+    Builds each block in the blocks object which has just started.
+
+    Args:
+        events (iterator): ijson events, read up to the end of the object.
+
+    Yields:
+        tuple: The block id and the block.
+    """
+    block_id = None
+    for event, value in events:
+        if event == 'map_key':
+            block_id = value
+        elif event == 'end_map':
+            return
+        elif event in ('start_map', 'start_array'):
+            builder = ObjectBuilder()
+            builder.event(event, value)
+            for nested_event, nested_value in value_events(events):
+                builder.event(nested_event, nested_value)
+            yield block_id, builder.value
+
+
+def value_events(events):
+    """
+    Reads the rest of a map or array which has just started, yielding its
+    events up to and including its end.
+    """
+    nesting = 1
+    for event, value in events:
+        yield event, value
+        if event in ('start_map', 'start_array'):
+            nesting += 1
+        elif event in ('end_map', 'end_array'):
+            nesting -= 1
+            if not nesting:
+                return
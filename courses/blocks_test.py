@@ -0,0 +1,144 @@
+"""
+Tests for reading the edX course blocks API
+"""
+# pylint: disable=no-self-use
+from copy import deepcopy
+from io import BytesIO
+import json
+import os
+
+from django.test import SimpleTestCase
+from ijson.common import IncompleteJSONError
+
+from courses.blocks import has_subchapters, parse_blocks
+
+
+def stream(payload):
+    """The payload as a response body"""
+    return BytesIO(json.dumps(payload).encode('utf-8'))
+
+
+class ParseBlocksTests(SimpleTestCase):
+    """
+    Tests for parse_blocks
+    """
+    def setUp(self):
+        with open(os.path.join(os.path.dirname(__file__), 'fixtures/course_structure.json')) as f:
+            self.structure_response = json.loads(f.read())
+
+    def test_keeps_chapters_and_subchapter_names(self):
+        """
+        The course, its chapters and its sequentials' names are all that's kept
+        """
+        parsed = parse_blocks(stream(self.structure_response))
+        blocks = self.structure_response['blocks']
+        root = self.structure_response['root']
+        assert parsed['root'] == root
+        assert parsed['blocks'][root] == {'id': root, 'children': blocks[root]['children']}
+        for chapter_id in blocks[root]['children']:
+            chapter = parsed['blocks'][chapter_id]
+            assert chapter['display_name'] == blocks[chapter_id]['display_name']
+            assert chapter['children'] == blocks[chapter_id]['children']
+            for child in chapter['children']:
+                assert parsed['blocks'][child] == {
+                    'display_name': blocks[child]['display_name']}
+        assert {block['type'] for block_id, block in blocks.items()
+                if block_id in parsed['blocks']} == {'course', 'chapter', 'sequential'}
+
+    def test_root_after_blocks(self):
+        """
+        Keys can come in any order, and other fields are ignored
+        """
+        body = (
+            b'{"extra": {"nested": [1, {"blocks": {}}]}, "blocks": {"c": {"type": "course", '
+            b'"children": ["ch"], "meta": {"a": [1]}}, "ch": {"type": "chapter", "id": "ch", '
+            b'"display_name": "Chapter", "children": [], "visible_to_staff_only": true}, '
+            b'"v": {"type": "vertical", "display_name": "Vertical"}}, "root": "c"}'
+        )
+        assert parse_blocks(BytesIO(body)) == {
+            'root': 'c',
+            'blocks': {
+                'c': {'children': ['ch']},
+                'ch': {
+                    'id': 'ch', 'display_name': 'Chapter', 'children': [],
+                    'visible_to_staff_only': True,
+                },
+            },
+        }
+
+    def test_named_types(self):
+        """
+        Names are kept for the given block types, or for all of them, and
+        for any children of chapters
+        """
+        body = stream({'root': 'c', 'blocks': {
+            'c': {'type': 'course', 'children': ['ch']},
+            'ch': {'type': 'chapter', 'display_name': 'Chapter', 'children': ['v', 's']},
+            'v': {'type': 'vertical', 'display_name': 'Vertical', 'children': ['p']},
+            's': {'type': 'sequential', 'display_name': 'Sequential', 'children': ['u']},
+            'u': {'type': 'vertical', 'display_name': 'Unit'},
+            'p': {'type': 'problem', 'display_name': 'Problem'},
+        }}).getvalue()
+        assert set(parse_blocks(BytesIO(body))['blocks']) == {'c', 'ch', 'v', 's'}
+        assert set(parse_blocks(BytesIO(body), ('vertical',))['blocks']) == {
+            'c', 'ch', 'v', 's', 'u'}
+        assert set(parse_blocks(BytesIO(body), None)['blocks']) == {
+            'c', 'ch', 'v', 's', 'u', 'p'}
+        assert parse_blocks(BytesIO(body), None)['blocks']['p'] == {'display_name': 'Problem'}
+
+    def test_chapter_children_before_chapter(self):
+        """
+        A chapter's children are named whatever their type, even when they
+        come before the chapter
+        """
+        body = (
+            b'{"blocks": {"v": {"type": "vertical", "display_name": "Unit"}, '
+            b'"p": {"type": "problem", "display_name": "Problem"}, '
+            b'"ch": {"type": "chapter", "id": "ch", "display_name": "Chapter", '
+            b'"children": ["v"]}, "c": {"type": "course", "children": ["ch"]}}, "root": "c"}'
+        )
+        parsed = parse_blocks(BytesIO(body))
+        assert parsed['blocks']['v'] == {'display_name': 'Unit'}
+        assert 'p' not in parsed['blocks']
+        assert has_subchapters(parsed)
+
+    def test_incomplete_response(self):
+        """
+        A truncated body is an error, not a partial course
+        """
+        body = stream(self.structure_response).getvalue()
+        with self.assertRaises(IncompleteJSONError):
+            parse_blocks(BytesIO(body[:len(body) // 2]))
+
+
+class HasSubchaptersTests(SimpleTestCase):
+    """
+    Tests for has_subchapters
+    """
+    def setUp(self):
+        self.response = {'root': 'c', 'blocks': {
+            'c': {'children': ['ch']},
+            'ch': {'display_name': 'Chapter', 'children': ['s']},
+            's': {'display_name': 'Sequential'},
+        }}
+
+    def test_complete(self):
+        """
+        Every chapter and every child of one is there, with its name
+        """
+        assert has_subchapters(self.response)
+        self.response['blocks']['ch'].pop('children')
+        assert has_subchapters(self.response)
+
+    def test_missing_blocks(self):
+        """
+        Any missing block or name means the response isn't complete
+        """
+        for block_id, field in (('c', 'children'), ('ch', 'display_name'),
+                                ('s', 'display_name')):
+            response = deepcopy(self.response)
+            del response['blocks'][block_id][field]
+            assert not has_subchapters(response), (block_id, field)
+            response = deepcopy(self.response)
+            del response['blocks'][block_id]
+            assert not has_subchapters(response), block_id
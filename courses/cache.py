@@ -0,0 +1,185 @@
+"""
+Caching for the read-only catalog endpoints.
+
+Responses are cached server side in the shared cache, keyed on a
+catalog-wide version number. Rather than tracking which keys a change
+affects, any write to the catalog bumps the version, which orphans every
+previously cached response at once.
+
+Cached responses are stored along with their compressed variants, see
+courses.compression.
+
+Clients can also cache on their end, revalidating with ETag and
+Last-Modified validators derived from the ``updated_at`` of what the
+response covers.
+"""
+import calendar
+from functools import wraps
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.encoding import force_bytes
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from .compression import compress_variants, is_compressible, use_variant, weaken_etag
+
+CATALOG_VERSION_KEY = 'courses:catalog-version'
+# Media types whose responses are the same for every user, so can be shared.
+CACHED_MEDIA_TYPES = ('application/json', 'application/msgpack')
+
+
+def get_catalog_version():
+    """
+    Current catalog version, initializing it if needed.
+
+    A missing version (first use, or evicted) is seeded randomly so it won't
+    line up with versions used before the eviction.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, random.SystemRandom().getrandbits(52), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def invalidate_catalog():
+    """
+    Orphan every cached catalog response.
+    """
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Nothing to invalidate yet. Seed it so readers start fresh.
+        get_catalog_version()
+
+
+def request_cache_key(prefix, request):
+    """
+    Cache key for something derived from a request. Includes the full url (so
+    host, endpoint and query string) and the negotiated media type.
+    """
+    digest = hashlib.md5(force_bytes('{} {}'.format(
+        request.build_absolute_uri(), request.accepted_media_type))).hexdigest()
+    return 'courses:{}:{}:{}'.format(prefix, get_catalog_version(), digest)
+
+
+def is_cacheable(request):
+    """
+    Whether responses to ``request`` can be shared between users. Browsable
+    API pages can't, they show the user's name and CSRF token.
+    """
+    renderer = request.accepted_renderer
+    return (
+        not isinstance(renderer, BrowsableAPIRenderer) and
+        renderer.media_type in CACHED_MEDIA_TYPES
+    )
+
+
+def cached_response(func):
+    """
+    Decorator for viewset actions which serves successful API responses out
+    of the shared cache, compressed if the client accepts it.
+    """
+    @wraps(func)
+    def wrapper(view, request, *args, **kwargs):
+        """
+        Returns the cached body if we have one, otherwise renders the
+        response and caches it.
+        """
+        if not is_cacheable(request):
+            return func(view, request, *args, **kwargs)
+
+        key = request_cache_key('encoded-response', request)
+        hit = cache.get(key)
+        if hit is not None:
+            content, content_type, variants = hit
+            response = HttpResponse(content, content_type=content_type)
+            use_variant(request, response, variants)
+            return response
+
+        response = func(view, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            if isinstance(response, Response):
+                # Render now so we can store the bytes. finalize_response
+                # will set these again, but won't re-render.
+                response.accepted_renderer = request.accepted_renderer
+                response.accepted_media_type = request.accepted_media_type
+                response.renderer_context = view.get_renderer_context()
+                response.render()
+            variants = {}
+            if is_compressible(response['Content-Type']):
+                variants = compress_variants(response.content)
+            cache.set(
+                key, (response.content, response['Content-Type'], variants),
+                settings.API_CACHE_TIMEOUT)
+            use_variant(request, response, variants)
+        return response
+    return wrapper
+
+
+def conditional_response(get_state):
+    """
+    Decorator for viewset actions which adds ETag and Last-Modified headers
+    and answers matching conditional requests with a 304, before any
+    serialization happens.
+
+    Args:
+        get_state (callable): Called with the same arguments as the action.
+            Returns an ``(updated_at, fingerprint)`` tuple describing what
+            the response covers, or None if it doesn't exist.
+            ``updated_at`` may be None for empty collections.
+    """
+    def decorator(func):
+        """
+        Wraps the action.
+        """
+        @wraps(func)
+        def wrapper(view, request, *args, **kwargs):
+            """
+            Returns a 304 if the client is up to date, otherwise the response
+            with its validators attached.
+            """
+            # Validators are cached alongside responses so revalidation
+            # doesn't need the database either.
+            key = request_cache_key('state', request)
+            state = cache.get(key)
+            if state is None:
+                state = get_state(view, request, *args, **kwargs)
+                if state is None:
+                    return func(view, request, *args, **kwargs)
+                cache.set(key, state, settings.API_CACHE_TIMEOUT)
+
+            updated_at, fingerprint = state
+            # The representation also depends on the url (host, query string)
+            # and media type, so those go into the tag as well.
+            etag = hashlib.md5(force_bytes('{} {} {} {}'.format(
+                request.build_absolute_uri(), request.accepted_media_type,
+                updated_at.isoformat() if updated_at else None,
+                fingerprint))).hexdigest()
+            # HTTP dates only have second resolution.
+            last_modified = None
+            if updated_at is not None:
+                last_modified = calendar.timegm(updated_at.utctimetuple())
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = func(view, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+
+            response['ETag'] = quote_etag(etag)
+            if response.has_header('Content-Encoding'):
+                weaken_etag(response)
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
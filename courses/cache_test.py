@@ -0,0 +1,277 @@
+"""
+Tests for the API response cache and conditional GETs
+"""
+# pylint: disable=no-self-use
+import json
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+import mock
+
+from courses.cache import CATALOG_VERSION_KEY, get_catalog_version, invalidate_catalog
+from courses.factories import CourseFactory, EdxAuthorFactory, ModuleFactory
+from courses.serializers import CourseSerializer, ModuleSerializer
+from courses.testing import capture_on_commit_callbacks
+from courses.views_test import ApiTests
+
+
+class CatalogVersionTests(TestCase):
+    """
+    Tests for catalog versioning
+    """
+    def setUp(self):
+        cache.clear()
+
+    def test_version_is_stable(self):
+        """Reading the version doesn't change it"""
+        assert get_catalog_version() == get_catalog_version()
+
+    def test_invalidate_bumps_version(self):
+        """Invalidating moves to a new version"""
+        version = get_catalog_version()
+        invalidate_catalog()
+        assert get_catalog_version() != version
+
+    def test_invalidate_without_version(self):
+        """Invalidating before anything has been cached is fine"""
+        invalidate_catalog()
+        assert get_catalog_version() is not None
+
+    def test_evicted_version_doesnt_reuse_old_versions(self):
+        """If the version key goes away, we don't go back to an old version"""
+        version = get_catalog_version()
+        invalidate_catalog()
+        cache.delete(CATALOG_VERSION_KEY)
+        assert get_catalog_version() not in (version, version + 1)
+
+
+class InvalidationSignalTests(TestCase):
+    """
+    Catalog writes should invalidate the cache
+    """
+    def setUp(self):
+        cache.clear()
+
+    def assert_invalidates(self, func):
+        """Assert that running func changes the catalog version, once committed"""
+        version = get_catalog_version()
+        with capture_on_commit_callbacks() as callbacks:
+            func()
+        assert get_catalog_version() == version
+        for callback in callbacks:
+            callback()
+        assert get_catalog_version() != version
+
+    def test_course_save(self):
+        """Saving a course invalidates"""
+        course = CourseFactory.create()
+        self.assert_invalidates(course.save)
+
+    def test_course_delete(self):
+        """Deleting a course invalidates"""
+        course = CourseFactory.create()
+        self.assert_invalidates(course.delete)
+
+    def test_module_save(self):
+        """Saving a module invalidates"""
+        module = ModuleFactory.create()
+        self.assert_invalidates(module.save)
+
+    def test_module_delete(self):
+        """Deleting a module invalidates"""
+        module = ModuleFactory.create()
+        self.assert_invalidates(module.delete)
+
+    def test_instructors_change(self):
+        """Changing a course's instructors invalidates"""
+        course = CourseFactory.create()
+        author = EdxAuthorFactory.create()
+        self.assert_invalidates(lambda: course.instructors.add(author))
+
+
+class ResponseCacheTests(ApiTests):
+    """
+    Tests for caching of read endpoint responses.
+    """
+    def get(self, url, **params):
+        """GET url and return the response along with the queries it ran"""
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url, params)
+        assert resp.status_code == 200, resp.content.decode('utf-8')
+        return resp, queries.captured_queries
+
+    def test_repeat_reads_skip_catalog_queries(self):
+        """
+        A second read of each endpoint is served without querying courses or
+        modules.
+        """
+        module = ModuleFactory.create()
+        for url in (
+                reverse('course-list'),
+                reverse('course-detail', kwargs={'uuid': module.course.uuid}),
+                reverse('module-list', kwargs={'uuid_uuid': module.course.uuid})):
+            first, _ = self.get(url)
+            second, queries = self.get(url)
+            assert second.content == first.content
+            assert second['Content-Type'] == first['Content-Type']
+            assert not [q for q in queries if 'courses_' in q['sql']], queries
+
+    def test_keyed_by_query_string(self):
+        """Different query strings are cached separately"""
+        for _ in range(3):
+            CourseFactory.create()
+        one, _ = self.get(reverse('course-list'), page_size=1)
+        two, _ = self.get(reverse('course-list'), page_size=2)
+        assert len(json.loads(one.content.decode('utf-8'))['results']) == 1
+        assert len(json.loads(two.content.decode('utf-8'))['results']) == 2
+
+    def test_course_save_invalidates(self):
+        """Saving a course drops cached responses"""
+        course = CourseFactory.create()
+        url = reverse('course-detail', kwargs={'uuid': course.uuid})
+        self.get(url)
+        course.title = 'changed'
+        with capture_on_commit_callbacks(execute=True):
+            course.save()
+        resp, _ = self.get(url)
+        assert json.loads(resp.content.decode('utf-8'))['title'] == 'changed'
+
+    def test_module_delete_invalidates(self):
+        """Deleting a module drops cached module lists"""
+        module = ModuleFactory.create()
+        url = reverse('module-list', kwargs={'uuid_uuid': module.course.uuid})
+        self.get(url)
+        with capture_on_commit_callbacks(execute=True):
+            module.delete()
+        resp, _ = self.get(url)
+        assert json.loads(resp.content.decode('utf-8')) == []
+
+    def test_errors_not_cached(self):
+        """Only successful responses are cached"""
+        url = reverse('course-detail', kwargs={'uuid': uuid.uuid4()})
+        assert self.client.get(url).status_code == 404
+        with CaptureQueriesContext(connection) as queries:
+            assert self.client.get(url).status_code == 404
+        assert [q for q in queries.captured_queries if 'courses_course' in q['sql']]
+
+    def test_cache_requires_authentication(self):
+        """Cached responses still require a logged in user"""
+        course = CourseFactory.create()
+        url = reverse('course-detail', kwargs={'uuid': course.uuid})
+        self.get(url)
+        self.client.logout()
+        assert self.client.get(url).status_code == 401
+
+    @override_settings(
+        STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_browsable_pages_not_shared(self):
+        """
+        Browsable API pages, which show who's logged in, aren't cached
+        """
+        course = CourseFactory.create()
+        url = reverse('course-detail', kwargs={'uuid': course.uuid})
+        pages = {}
+        for username in ('alice', 'bob'):
+            User.objects.create_user(username, password=username)
+            assert self.client.login(username=username, password=username)
+            resp = self.client.get(url, HTTP_ACCEPT='text/html')
+            assert resp.status_code == 200
+            assert resp['Content-Type'].startswith('text/html')
+            pages[username] = resp.content.decode('utf-8')
+        assert 'alice' in pages['alice']
+        assert 'bob' in pages['bob']
+        assert 'alice' not in pages['bob']
+
+
+class ConditionalGetTests(ApiTests):
+    """
+    Tests for ETag and Last-Modified handling on read endpoints.
+    """
+    @staticmethod
+    def endpoints(module):
+        """The endpoints supporting conditional GETs"""
+        return (
+            reverse('course-list'),
+            reverse('course-detail', kwargs={'uuid': module.course.uuid}),
+            reverse('module-list', kwargs={'uuid_uuid': module.course.uuid}),
+        )
+
+    def test_validators_present(self):
+        """Responses carry an ETag and Last-Modified"""
+        module = ModuleFactory.create()
+        for url in self.endpoints(module):
+            resp = self.client.get(url)
+            assert resp.status_code == 200
+            assert resp['ETag'].startswith('"')
+            assert resp.has_header('Last-Modified')
+
+    def test_if_none_match(self):
+        """A matching ETag is a 304 with no body, before any serialization"""
+        module = ModuleFactory.create()
+        for url in self.endpoints(module):
+            etag = self.client.get(url)['ETag']
+            course_patch = mock.patch.object(CourseSerializer, 'to_representation', autospec=True)
+            module_patch = mock.patch.object(ModuleSerializer, 'to_representation', autospec=True)
+            with course_patch as course_repr, module_patch as module_repr:
+                resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert resp.status_code == 304
+            assert resp.content == b''
+            assert resp['ETag'] == etag
+            assert not course_repr.called
+            assert not module_repr.called
+
+    def test_if_modified_since(self):
+        """An up to date If-Modified-Since is a 304"""
+        module = ModuleFactory.create()
+        for url in self.endpoints(module):
+            last_modified = self.client.get(url)['Last-Modified']
+            resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            assert resp.status_code == 304
+
+    def test_stale_etag(self):
+        """Changes to the course or its modules change the ETag"""
+        module = ModuleFactory.create()
+        etags = [self.client.get(url)['ETag'] for url in self.endpoints(module)]
+
+        module.course.title = 'changed'
+        with capture_on_commit_callbacks(execute=True):
+            module.course.save()
+        course_list, course_detail, _ = self.endpoints(module)
+        for url, etag in zip((course_list, course_detail), etags):
+            assert self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+        module_list = self.endpoints(module)[2]
+        etag = self.client.get(module_list)['ETag']
+        with capture_on_commit_callbacks(execute=True):
+            ModuleFactory.create(course=module.course)
+        assert self.client.get(module_list, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_module_delete_changes_etag(self):
+        """Removing a module changes the module list ETag"""
+        module = ModuleFactory.create()
+        ModuleFactory.create(course=module.course, order=1)
+        url = reverse('module-list', kwargs={'uuid_uuid': module.course.uuid})
+        etag = self.client.get(url)['ETag']
+        with capture_on_commit_callbacks(execute=True):
+            module.delete()
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_etag_varies_with_query(self):
+        """Different pages of the same list have different ETags"""
+        for _ in range(3):
+            CourseFactory.create()
+        one = self.client.get(reverse('course-list'), {'page_size': 1})
+        two = self.client.get(reverse('course-list'), {'page_size': 2})
+        assert one['ETag'] != two['ETag']
+
+    def test_missing_course(self):
+        """Unknown or malformed uuids still 404"""
+        for lookup in (uuid.uuid4(), 'not-a-uuid'):
+            resp = self.client.get(reverse('course-detail', kwargs={'uuid': lookup}))
+            assert resp.status_code == 404
+            assert not resp.has_header('ETag')
@@ -0,0 +1,169 @@
+"""
+Compression of API responses.
+
+Clients get brotli or gzip depending on their Accept-Encoding. Cached
+responses keep their compressed variants alongside the plain body (see
+courses.cache), so only the first read of each pays for compressing it.
+Everything else is compressed on the way out by CompressionMiddleware.
+
+Only API media types are compressed. HTML pages can hold CSRF tokens, which
+compressing would expose to BREACH.
+"""
+import re
+
+import brotli
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/msgpack')
+# Not worth compressing anything shorter than this.
+MIN_LENGTH = 200
+# Brotli's default (11) is far too slow for compressing on a request.
+BROTLI_QUALITY = 5
+
+re_qvalue = re.compile(r';\s*q=([0-9.]+)')
+
+
+def brotli_compress_string(content):
+    """
+    Brotli counterpart to django.utils.text.compress_string.
+    """
+    return brotli.compress(content, quality=BROTLI_QUALITY)
+
+
+def brotli_compress_sequence(sequence):
+    """
+    Brotli counterpart to django.utils.text.compress_sequence.
+    """
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+# Content codings we can produce, preferred first, with functions to
+# compress a string and a sequence of strings.
+ENCODINGS = (
+    ('br', brotli_compress_string, brotli_compress_sequence),
+    ('gzip', compress_string, compress_sequence),
+)
+
+
+def accepted_encodings(request):
+    """
+    Content codings the client accepts, ignoring any with q=0.
+    """
+    accepted = set()
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name = coding.split(';', 1)[0].strip().lower()
+        qvalue = re_qvalue.search(coding)
+        try:
+            if qvalue and float(qvalue.group(1)) == 0:
+                continue
+        except ValueError:
+            continue
+        if name:
+            accepted.add(name)
+    return accepted
+
+
+def preferred_encoding(request, available=None):
+    """
+    The content coding to respond with, out of those in ``available`` (all
+    of ENCODINGS by default), or None if the client accepts none of them.
+    """
+    accepted = accepted_encodings(request)
+    for encoding in ENCODINGS:
+        if encoding[0] in accepted and (available is None or encoding[0] in available):
+            return encoding
+    return None
+
+
+def is_compressible(content_type):
+    """
+    Whether responses of this Content-Type should be compressed.
+    """
+    return content_type.split(';', 1)[0].strip() in COMPRESSIBLE_TYPES
+
+
+def compress_variants(content):
+    """
+    Compressed versions of ``content``, keyed by content coding. Codings
+    which wouldn't make it smaller are left out.
+    """
+    variants = {}
+    if len(content) < MIN_LENGTH:
+        return variants
+    for name, compress, _ in ENCODINGS:
+        compressed = compress(content)
+        if len(compressed) < len(content):
+            variants[name] = compressed
+    return variants
+
+
+def use_variant(request, response, variants):
+    """
+    Swaps a response's body for the preferred of its precompressed
+    ``variants`` the client accepts, if any.
+    """
+    encoding = preferred_encoding(request, variants)
+    if encoding is not None:
+        set_encoded_content(response, encoding[0], variants[encoding[0]])
+
+
+def set_encoded_content(response, coding, content):
+    """
+    Swaps a response's body for an encoded version of it.
+    """
+    response.content = content
+    response['Content-Length'] = str(len(content))
+    response['Content-Encoding'] = coding
+    weaken_etag(response)
+
+
+def weaken_etag(response):
+    """
+    Strong ETags promise byte for byte identical bodies, which an encoded
+    body no longer is.
+    """
+    if response.has_header('ETag') and not response['ETag'].startswith('W/'):
+        response['ETag'] = 'W/' + response['ETag']
+
+
+class CompressionMiddleware(object):
+    """
+    Compresses API responses which weren't compressed already.
+    """
+    def process_response(self, request, response):  # pylint: disable=no-self-use
+        """
+        Compresses the response as the client prefers, if it's worth it.
+        """
+        if not is_compressible(response.get('Content-Type', '')):
+            return response
+        # Also for responses encoded by the view, as DRF resets the Vary
+        # header views set.
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and len(response.content) < MIN_LENGTH:
+            return response
+
+        encoding = preferred_encoding(request)
+        if encoding is None:
+            return response
+        name, compress_string_func, compress_sequence_func = encoding
+
+        if response.streaming:
+            # We won't know the compressed length until it's all streamed.
+            response.streaming_content = compress_sequence_func(response.streaming_content)
+            del response['Content-Length']
+            response['Content-Encoding'] = name
+            weaken_etag(response)
+            return response
+
+        compressed = compress_string_func(response.content)
+        if len(compressed) < len(response.content):
+            set_encoded_content(response, name, compressed)
+        return response
@@ -0,0 +1,120 @@
+"""
+Tests for response compression
+"""
+# pylint: disable=no-self-use
+import gzip
+import io
+import json
+
+import brotli
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+import mock
+
+from courses.compression import (
+    CompressionMiddleware,
+    accepted_encodings,
+    compress_variants,
+)
+from courses.factories import CourseFactory, ModuleFactory
+
+
+def gunzip(content):
+    """Decompress gzipped bytes"""
+    return gzip.GzipFile(fileobj=io.BytesIO(content)).read()
+
+
+class AcceptEncodingTests(TestCase):
+    """
+    Tests for Accept-Encoding parsing.
+    """
+    def test_parsing(self):
+        """Codings are found regardless of case, spacing and q-values"""
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='GZip;q=0.5, br ,deflate;q=0')
+        assert accepted_encodings(request) == {'gzip', 'br'}
+
+    def test_missing(self):
+        """No header means no compression"""
+        assert accepted_encodings(RequestFactory().get('/')) == set()
+
+    def test_short_content_not_compressed(self):
+        """Short bodies aren't worth compressing"""
+        assert compress_variants(b'{}') == {}
+        assert set(compress_variants(b'{"a": "b"}' * 100)) == {'br', 'gzip'}
+
+
+class CompressedResponseTests(TestCase):
+    """
+    Tests for compressed API responses.
+    """
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('test', password='test')
+        assert self.client.login(username='test', password='test')
+
+    def test_cached_responses_keep_variants(self):
+        """Repeat reads are served precompressed without compressing again"""
+        for _ in range(3):
+            CourseFactory.create()
+        url = reverse('course-list')
+        plain = self.client.get(url).content
+
+        with mock.patch('courses.cache.compress_variants', autospec=True) as compress:
+            resp = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        assert not compress.called
+        assert resp['Content-Encoding'] == 'br'
+        assert 'Accept-Encoding' in resp['Vary']
+        assert brotli.decompress(resp.content) == plain
+
+        resp = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        assert resp['Content-Encoding'] == 'gzip'
+        assert gunzip(resp.content) == plain
+
+    def test_first_read_compressed(self):
+        """The read that fills the cache is compressed too"""
+        module = ModuleFactory.create()
+        url = reverse('module-list', kwargs={'uuid_uuid': module.course.uuid})
+        resp = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        assert resp['Content-Encoding'] == 'gzip'
+        cache.clear()
+        assert gunzip(resp.content) == self.client.get(url).content
+
+    def test_weak_etag(self):
+        """Compressed responses have weak ETags, which still revalidate"""
+        course = CourseFactory.create()
+        url = reverse('course-detail', kwargs={'uuid': course.uuid})
+        etag = self.client.get(url, HTTP_ACCEPT_ENCODING='br')['ETag']
+        assert etag.startswith('W/"')
+        resp = self.client.get(url, HTTP_ACCEPT_ENCODING='br', HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 304
+
+    def test_uncached_responses(self):
+        """Responses which aren't cached are compressed on the way out"""
+        for _ in range(3):
+            CourseFactory.create()
+        with self.settings(CHANGES_FEED_LAG=0):
+            resp = self.client.get(
+                reverse('changes'), {'updated_since': '2000-01-01T00:00:00Z'},
+                HTTP_ACCEPT_ENCODING='br')
+        assert resp['Content-Encoding'] == 'br'
+        assert len(json.loads(brotli.decompress(resp.content).decode('utf-8'))['courses']) == 3
+
+    def test_streaming(self):
+        """The streamed export is compressed as it goes"""
+        CourseFactory.create()
+        for encoding, decompress in (('gzip', gunzip), ('br', brotli.decompress)):
+            resp = self.client.get(reverse('export'), HTTP_ACCEPT_ENCODING=encoding)
+            assert resp['Content-Encoding'] == encoding
+            content = decompress(b''.join(resp.streaming_content)).decode('utf-8')
+            assert len(content.splitlines()) == 1
+
+    def test_html_not_compressed(self):
+        """Browsable API pages can carry CSRF tokens, so are left alone"""
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = CompressionMiddleware().process_response(
+            request, HttpResponse(b'<p>page</p>' * 100, content_type='text/html'))
+        assert not response.has_header('Content-Encoding')
+        assert not response.has_header('Vary')
@@ -5,6 +5,7 @@ import logging
 import json
 
 from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
 from django.http import QueryDict
 from rest_framework import serializers
 import six
@@ -68,15 +69,43 @@ class StringyManyToManyField(serializers.Field):
 
     def to_internal_value(self, value):
         """Incoming value to python value.
-        Values should only ever be a list or string."""
+        Values should only ever be a list or string.
+
+        Existing models are looked up in one query and the missing ones
+        created in one more, rather than a get_or_create each."""
         if isinstance(value, six.string_types):
             value = [value]
 
         if not isinstance(value, list):
             raise serializers.ValidationError("Only supports string or list input types.")
 
-        results = []
+        # Duplicates dropped, order kept.
+        values = []
         for v in value:
-            model, _ = self.model.objects.get_or_create(**{self.prop: v})
-            results.append(model)
-        return results
+            v = six.text_type(v)
+            if v not in values:
+                values.append(v)
+
+        found = self.lookup(values)
+        missing = [v for v in values if v not in found]
+        if missing:
+            try:
+                with transaction.atomic():
+                    self.model.objects.bulk_create(
+                        self.model(**{self.prop: v}) for v in missing)
+            except IntegrityError:
+                # A concurrent push created some of them first. get_or_create
+                # copes with that, one at a time.
+                for v in missing:
+                    found[v], _ = self.model.objects.get_or_create(**{self.prop: v})
+            else:
+                # Looked up again, as bulk_create doesn't set primary keys.
+                found.update(self.lookup(missing))
+        return [found[v] for v in values]
+
+    def lookup(self, values):
+        """Existing models for the given values, keyed by value."""
+        return {
+            six.text_type(getattr(model, self.prop)): model
+            for model in self.model.objects.filter(**{'{}__in'.format(self.prop): values})
+        }
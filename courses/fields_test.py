@@ -2,7 +2,10 @@
 Tests for Serializer Fields
 """
 from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+import mock
 import pytest
 from rest_framework.serializers import ValidationError
 
@@ -100,3 +103,37 @@ class StringyM2MTestCase(TestCase):
         f = SMMF(model=EdxAuthor, lookup='edx_uid')
         with pytest.raises(ValidationError):
             f.to_internal_value(dict())
+
+    def test_resolves_in_batch(self):  # pylint: disable=no-self-use
+        """Known models are looked up together, missing ones created together"""
+        known = EdxAuthorFactory.create()
+        uids = ['a' * 32, known.edx_uid, 'b' * 32, 'a' * 32]
+        f = SMMF(model=EdxAuthor, lookup='edx_uid')
+        with CaptureQueriesContext(connection) as queries:
+            ms = f.to_internal_value(uids)
+        assert [m.edx_uid for m in ms] == ['a' * 32, known.edx_uid, 'b' * 32]
+        assert ms[1] == known
+        assert all(m.pk for m in ms)
+        assert EdxAuthor.objects.count() == 3
+        # Lookup, insert, then lookup of the inserted ones.
+        assert len([q for q in queries.captured_queries if 'courses_edxauthor' in q['sql']]) == 3
+
+    def test_no_writes_when_all_known(self):  # pylint: disable=no-self-use
+        """Nothing is inserted when every model exists"""
+        known = [EdxAuthorFactory.create() for _ in range(3)]
+        f = SMMF(model=EdxAuthor, lookup='edx_uid')
+        with CaptureQueriesContext(connection) as queries:
+            ms = f.to_internal_value([author.edx_uid for author in known])
+        assert ms == known
+        assert len(queries.captured_queries) == 1
+
+    def test_concurrent_create(self):  # pylint: disable=no-self-use
+        """Models created by a concurrent push after the lookup are picked up"""
+        raced = EdxAuthorFactory.create()
+        f = SMMF(model=EdxAuthor, lookup='edx_uid')
+        # The lookup misses the model, as if it were created just after.
+        with mock.patch.object(f, 'lookup', autospec=True, return_value={}):
+            ms = f.to_internal_value([raced.edx_uid, 'c' * 32])
+        assert ms[0] == raced
+        assert ms[1].edx_uid == 'c' * 32
+        assert EdxAuthor.objects.count() == 2
@@ -0,0 +1,146 @@
+"""
+Compares the memory used reading a blocks API response in full and as a stream
+"""
+from __future__ import division
+
+from itertools import count
+import json
+import tempfile
+from timeit import default_timer
+
+from django.core.management import BaseCommand, CommandError
+
+from courses.blocks import parse_blocks
+
+COURSE_KEY = 'course-v1:BenchmarkX+Blocks+2T2016'
+LMS_URL = 'https://courses.edx.org'
+
+
+def make_block(block_type, num, children=None):
+    """
+    A block as the blocks API describes it.
+    """
+    block_id = 'block-v1:{}+type@{}+block@{:032x}'.format(
+        COURSE_KEY.split(':', 1)[1], block_type, num)
+    block = {
+        'id': block_id,
+        'block_id': '{:032x}'.format(num),
+        'type': block_type,
+        'display_name': '{} {}'.format(block_type.title(), num),
+        'lms_web_url': '{}/courses/{}/jump_to/{}'.format(LMS_URL, COURSE_KEY, block_id),
+        'student_view_url': '{}/xblock/{}'.format(LMS_URL, block_id),
+    }
+    if children is not None:
+        block['children'] = children
+    return block
+
+
+def make_course(total, chapters):
+    """
+    A ``depth=all`` blocks API response for a synthetic course of about
+    ``total`` blocks: chapters of 10 sequentials of 5 verticals each, with
+    the rest of the blocks spread over the verticals as problems.
+    """
+    blocks = {}
+    counter = count()
+
+    def add(block_type, children=None):
+        """Adds a block, returning its id"""
+        block = make_block(block_type, next(counter), children)
+        blocks[block['id']] = block
+        return block['id']
+
+    verticals = chapters * 10 * 5
+    per_vertical = max((total - 1 - chapters * 11 - verticals) // verticals, 0)
+    chapter_ids = []
+    for chapter_num in range(chapters):
+        sequential_ids = []
+        for _ in range(10):
+            vertical_ids = [
+                add('vertical', [add('problem') for _ in range(per_vertical)])
+                for _ in range(5)
+            ]
+            sequential_ids.append(add('sequential', vertical_ids))
+        chapter_id = add('chapter', sequential_ids)
+        if chapter_num % 7 == 6:
+            blocks[chapter_id]['visible_to_staff_only'] = True
+        chapter_ids.append(chapter_id)
+    return {'root': add('course', chapter_ids), 'blocks': blocks}
+
+
+def summarize(response):
+    """
+    What module_population takes from a response: each chapter's id, name,
+    visibility and subchapter names.
+    """
+    blocks = response['blocks']
+    return [
+        (chapter_id, blocks[chapter_id]['display_name'],
+         blocks[chapter_id].get('visible_to_staff_only'),
+         [blocks[child]['display_name'] for child in blocks[chapter_id]['children']])
+        for chapter_id in blocks[response['root']]['children']
+    ]
+
+
+class Command(BaseCommand):
+    """
+    Compares the memory used reading a blocks API response in full and as a stream
+    """
+    help = (
+        "Measures peak memory (with tracemalloc) and time for reading a "
+        "synthetic course's blocks the way resp.json() does and with the "
+        "streaming parser."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--blocks',
+            dest='blocks',
+            default=50000,
+            help='Number of blocks in the course',
+        )
+
+        parser.add_argument(
+            '--chapters',
+            dest='chapters',
+            default=20,
+            help='Number of chapters in the course',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            import tracemalloc
+        except ImportError:
+            raise CommandError("tracemalloc needs Python 3.4 or later.")
+
+        course = make_course(int(options['blocks']), int(options['chapters']))
+        expected = summarize(course)
+        with tempfile.TemporaryFile() as body:
+            body.write(json.dumps(course).encode('utf-8'))
+            self.stdout.write("{} blocks, {:.1f} MB response".format(
+                len(course['blocks']), body.tell() / 2 ** 20))
+            del course
+
+            def read_in_full():
+                """As resp.json() does: the whole body, then all of it parsed"""
+                body.seek(0)
+                return json.loads(body.read().decode('utf-8'))
+
+            def read_streaming():
+                """As module_population does"""
+                body.seek(0)
+                return parse_blocks(body)
+
+            for name, read in (('json.loads', read_in_full), ('parse_blocks', read_streaming)):
+                # Not timeit, which turns off garbage collection. ijson
+                # leaves a reference cycle behind for each block it builds.
+                tracemalloc.start()
+                start = default_timer()
+                read()
+                seconds = default_timer() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                if summarize(read()) != expected:
+                    raise CommandError("{} read the course wrong.".format(name))
+                self.stdout.write("{:<14} {:>8.1f} MB peak {:>8.2f} s".format(
+                    name, peak / 2 ** 20, seconds))
@@ -0,0 +1,26 @@
+"""test blocks parser benchmark"""
+# pylint: disable=no-self-use
+from unittest import skipUnless
+
+from django.test import SimpleTestCase
+from django.utils.six import StringIO
+
+from .benchmark_blocks_parser import Command
+
+try:
+    import tracemalloc  # pylint: disable=unused-import
+except ImportError:
+    tracemalloc = None
+
+
+class BenchmarkBlocksParserTestCase(SimpleTestCase):
+    """test blocks parser benchmark"""
+    @skipUnless(tracemalloc, "Needs tracemalloc")
+    def test_measures_both_parsers(self):
+        """Should measure each way of reading the course"""
+        out = StringIO()
+        Command(stdout=out).handle(blocks=2000, chapters=3)
+
+        output = out.getvalue()
+        assert 'json.loads ' in output
+        assert 'parse_blocks ' in output
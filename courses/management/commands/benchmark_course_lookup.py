@@ -0,0 +1,108 @@
+"""
+Compares looking courses up by course_id with and without its hash
+"""
+from functools import partial
+import random
+import timeit
+
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+
+from courses.models import Course, hash_course_id
+
+
+class Command(BaseCommand):
+    """
+    Compares looking courses up by course_id with and without its hash
+    """
+    help = (
+        "Times course_id lookups against a catalog of the given size. The "
+        "courses are created for the run and rolled back after."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--courses',
+            dest='courses',
+            default=100000,
+            help='Number of courses in the catalog',
+        )
+
+        parser.add_argument(
+            '--lookups',
+            dest='lookups',
+            default=1000,
+            help='Number of lookups to time each way',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            course_ids = self.create_courses(int(options['courses']))
+            sample = [random.choice(course_ids) for _ in range(int(options['lookups']))]
+
+            lookups = (
+                ('course_id', lambda course_id: Course.objects.filter(course_id=course_id)),
+                ('course_id_hash', Course.objects.by_course_id),
+            )
+            for name, lookup in lookups:
+                seconds = timeit.timeit(partial(self.run_lookups, lookup, sample), number=1)
+                self.stdout.write("{:<16} {:>8.3f} ms per lookup".format(
+                    name, seconds / len(sample) * 1000))
+                self.explain(lookup(sample[0]).values_list('pk'))
+
+            if connection.vendor == 'postgresql':
+                self.show_index_sizes()
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def create_courses(count):
+        """
+        Inserts ``count`` courses with realistically long course_ids,
+        skipping signals. Returns their course_ids.
+        """
+        course_ids = [
+            'course-v1:BenchmarkX+Course{0:07d}+{1}T{2}'.format(num, num % 3 + 1, 2010 + num % 8)
+            for num in range(count)
+        ]
+        for start in range(0, count, 1000):
+            Course.objects.bulk_create(
+                Course(
+                    title='Benchmark course', course_id=course_id,
+                    course_id_hash=hash_course_id(course_id), image_url='https://edx.org/x.png',
+                )
+                for course_id in course_ids[start:start + 1000]
+            )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE courses_course')
+        return course_ids
+
+    @staticmethod
+    def run_lookups(lookup, course_ids):
+        """
+        Looks up the primary key of each course.
+        """
+        for course_id in course_ids:
+            lookup(course_id).values_list('pk').first()
+
+    def explain(self, queryset):
+        """
+        Writes out the query plan for ``queryset``.
+        """
+        sql, params = queryset.query.sql_with_params()
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            for row in cursor.fetchall():
+                self.stdout.write('    {}'.format(' '.join(str(column) for column in row)))
+
+    def show_index_sizes(self):
+        """
+        Writes out the size of each index on the course table.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname, pg_size_pretty(pg_relation_size(indexname::regclass)) "
+                "FROM pg_indexes WHERE tablename = 'courses_course' ORDER BY indexname")
+            for name, size in cursor.fetchall():
+                self.stdout.write("{:<60} {:>10}".format(name, size))
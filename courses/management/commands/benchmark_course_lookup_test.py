@@ -0,0 +1,20 @@
+"""test course lookup benchmark"""
+# pylint: disable=no-self-use
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from courses.models import Course
+from .benchmark_course_lookup import Command
+
+
+class BenchmarkCourseLookupTestCase(TestCase):
+    """test course lookup benchmark"""
+    def test_times_both_lookups(self):
+        """Should time each lookup and leave no courses behind"""
+        out = StringIO()
+        Command(stdout=out).handle(courses=50, lookups=5)
+
+        output = out.getvalue()
+        assert 'course_id ' in output
+        assert 'course_id_hash ' in output
+        assert Course.objects.count() == 0
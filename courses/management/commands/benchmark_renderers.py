@@ -0,0 +1,75 @@
+"""
+Compares API renderers on the catalog
+"""
+from collections import OrderedDict
+from functools import partial
+import timeit
+
+from django.core.management import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from courses.models import Course
+from courses.renderers import FastJSONRenderer, MessagePackRenderer
+from courses.serializers import CourseSerializer
+from courses.views import CourseViewSet
+
+
+class Command(BaseCommand):
+    """
+    Compares API renderers on the catalog
+    """
+    help = (
+        "Times each API renderer on a page of courses with their modules "
+        "expanded. Run gen_fake_data first for a catalog to work with."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--courses',
+            dest='courses',
+            default=100,
+            help='Number of courses in the page',
+        )
+
+        parser.add_argument(
+            '--iterations',
+            dest='iterations',
+            default=20,
+            help='Number of times to render with each renderer',
+        )
+
+    def handle(self, *args, **options):
+        data = self.build_payload(int(options['courses']))
+        if not data['results']:
+            raise CommandError("No courses to render.")
+
+        context = {'view': CourseViewSet()}
+        iterations = int(options['iterations'])
+        baseline = JSONRenderer().render(data, 'application/json', context)
+        for renderer in (JSONRenderer(), FastJSONRenderer(), MessagePackRenderer()):
+            seconds = timeit.timeit(
+                partial(renderer.render, data, renderer.media_type, context), number=iterations)
+            rendered = renderer.render(data, renderer.media_type, context)
+            note = ''
+            if isinstance(renderer, JSONRenderer):
+                note = 'identical' if rendered == baseline else 'DIFFERS FROM JSONRenderer'
+            self.stdout.write("{:<20} {:>8.2f} ms {:>10} bytes  {}".format(
+                type(renderer).__name__, seconds / iterations * 1000, len(rendered), note))
+
+    @staticmethod
+    def build_payload(courses):
+        """
+        A page of courses, serialized as the course list does for
+        ?expand=modules.
+        """
+        request = Request(RequestFactory().get('/api/v1/coursexs/', {'expand': 'modules'}))
+        queryset = Course.objects.select_related('edx_instance').prefetch_related(
+            'instructors', 'module_set')[:courses]
+        return OrderedDict([
+            ('next', None),
+            ('previous', None),
+            ('results', CourseSerializer(queryset, many=True, context={
+                'request': request, 'expand': {'modules'}}).data),
+        ])
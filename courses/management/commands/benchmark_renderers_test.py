@@ -0,0 +1,27 @@
+"""test renderer benchmark"""
+# pylint: disable=no-self-use
+from django.core.management import CommandError
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from courses.factories import ModuleFactory
+from .benchmark_renderers import Command
+
+
+class BenchmarkRenderersTestCase(TestCase):
+    """test renderer benchmark"""
+    def test_reports_each_renderer(self):
+        """Should time every renderer, with JSON output identical"""
+        ModuleFactory.create()
+        out = StringIO()
+        Command(stdout=out).handle(courses=10, iterations=1)
+
+        lines = out.getvalue().splitlines()
+        assert [line.split()[0] for line in lines] == [
+            'JSONRenderer', 'FastJSONRenderer', 'MessagePackRenderer']
+        assert lines[1].endswith('identical')
+
+    def test_needs_courses(self):
+        """Should complain if there's nothing to render"""
+        with self.assertRaises(CommandError):
+            Command().handle(courses=10, iterations=1)
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.4 on 2026-10-18 08:40
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_change_default_module_ordering'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='course',
+            index_together=set([('updated_at', 'id')]),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.4 on 2026-10-18 08:50
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0014_changes_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='modules_snapshot',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='snapshot',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.4 on 2026-10-18 10:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0015_course_snapshots'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='uuid',
+            field=models.UUIDField(db_index=True, default=uuid.uuid4, editable=False),
+        ),
+    ]
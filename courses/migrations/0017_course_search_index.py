@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.4 on 2026-10-18 11:05
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# Must stay in step with courses.search.SEARCH_VECTOR.
+CREATE_INDEX = """
+CREATE INDEX courses_course_search ON courses_course USING gin ((
+    setweight(to_tsvector('english'::regconfig, coalesce("title", '')), 'A') ||
+    setweight(to_tsvector('english'::regconfig, coalesce("author_name", '')), 'B') ||
+    setweight(to_tsvector('english'::regconfig, coalesce("overview", '')), 'C') ||
+    setweight(to_tsvector('english'::regconfig, coalesce("description", '')), 'D')
+))
+"""
+DROP_INDEX = "DROP INDEX IF EXISTS courses_course_search"
+
+
+def create_index(apps, schema_editor):  # pylint: disable=unused-argument
+    """
+    Full-text index for course search. Postgres only, search falls back to
+    substring matching elsewhere.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INDEX)
+
+
+def drop_index(apps, schema_editor):  # pylint: disable=unused-argument
+    """
+    Reverse of create_index.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0016_course_uuid_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.4 on 2026-10-18 11:40
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.db import migrations, models
+from django.utils.encoding import force_bytes
+
+
+def fill_course_id_hash(apps, schema_editor):  # pylint: disable=unused-argument
+    """
+    Hash the course_id of existing courses. Mirrors courses.models.hash_course_id.
+    """
+    Course = apps.get_model('courses', 'Course')
+    for pk, course_id in Course.objects.values_list('pk', 'course_id'):
+        Course.objects.filter(pk=pk).update(
+            course_id_hash=hashlib.sha1(force_bytes(course_id)).hexdigest())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0017_course_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='course_id_hash',
+            field=models.CharField(default='', editable=False, max_length=40),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_course_id_hash, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='course',
+            name='course_id_hash',
+            field=models.CharField(editable=False, max_length=40, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='course_id',
+            field=models.TextField(help_text='course locator from edx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.4 on 2026-10-18 12:10
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def delete_duplicate_modules(apps, schema_editor):  # pylint: disable=unused-argument
+    """
+    Keep only the newest module for each locator_id in a course, so they
+    can be made unique. Deletes are recorded for the changes feed as
+    courses.signals.record_tombstone would.
+    """
+    Module = apps.get_model('courses', 'Module')
+    Tombstone = apps.get_model('courses', 'Tombstone')
+    # Without order_by(), Meta.ordering would add order to the GROUP BY.
+    duplicated = Module.objects.order_by().values('course_id', 'locator_id').annotate(
+        count=Count('id'), newest=Max('id')).filter(count__gt=1)
+    for group in duplicated:
+        stale = Module.objects.filter(
+            course_id=group['course_id'], locator_id=group['locator_id'],
+        ).exclude(id=group['newest'])
+        Tombstone.objects.bulk_create(
+            Tombstone(model='Module', uuid=uuid) for uuid in stale.values_list('uuid', flat=True))
+        stale.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0018_course_id_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_modules, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='module',
+            unique_together=set([('course', 'locator_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='module',
+            index_together=set([('course', 'order')]),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.4 on 2026-10-18 15:02
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0020_course_push_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='modules_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+    ]
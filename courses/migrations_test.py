@@ -0,0 +1,63 @@
+"""
+Tests for data migrations
+"""
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+from courses.models import hash_course_id
+
+
+class MigrationTests(TransactionTestCase):
+    """
+    Migrates back to just before ``migrate_from``, to set up data for
+    ``migrate_to`` to work on.
+    """
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        latest = self.executor.loader.graph.leaf_nodes('courses')
+        self.addCleanup(self.migrate, latest)
+        self.apps = self.migrate([('courses', self.migrate_from)])
+
+    def migrate(self, targets):
+        """
+        Migrates to ``targets``, returning the apps as of then.
+        """
+        self.executor.loader.build_graph()
+        self.executor.migrate(targets)
+        return self.executor.loader.project_state(targets).apps
+
+
+class ModuleIndexesMigrationTests(MigrationTests):
+    """
+    Tests for 0019_module_indexes
+    """
+    migrate_from = '0018_course_id_hash'
+    migrate_to = '0019_module_indexes'
+
+    def test_duplicate_modules_deleted(self):
+        """
+        Only the newest of a course's modules with the same locator_id is
+        kept, whatever their order, and the rest are recorded as deleted
+        """
+        Course = self.apps.get_model('courses', 'Course')
+        Module = self.apps.get_model('courses', 'Module')
+        courses = [
+            Course.objects.create(
+                title='Course', course_id=course_id, course_id_hash=hash_course_id(course_id),
+                image_url='https://edx.org/x.png')
+            for course_id in ('course-v1:edX+A+1', 'course-v1:edX+B+1')
+        ]
+        stale = Module.objects.create(course=courses[0], locator_id='chapter', order=0)
+        kept = Module.objects.create(course=courses[0], locator_id='chapter', order=3)
+        other = Module.objects.create(course=courses[1], locator_id='chapter', order=0)
+
+        apps = self.migrate([('courses', self.migrate_to)])
+
+        Module = apps.get_model('courses', 'Module')
+        Tombstone = apps.get_model('courses', 'Tombstone')
+        assert sorted(Module.objects.values_list('id', flat=True)) == [kept.id, other.id]
+        assert list(Tombstone.objects.values_list('model', 'uuid')) == [('Module', stale.uuid)]
@@ -1,11 +1,12 @@
 """
 Models necessary to represent a course catalog.
 """
+import hashlib
 import uuid as pyuuid
 
 from django.db import models
 from django.contrib.auth.models import User
-from django.utils.encoding import python_2_unicode_compatible
+from django.utils.encoding import force_bytes, python_2_unicode_compatible
 from jsonfield import JSONField
 
 
@@ -25,15 +26,49 @@ class EdxAuthor(models.Model):
         return self.edx_uid
 
 
+def hash_course_id(course_id):
+    """
+    Fixed width digest of a course_id, for indexed lookups.
+    """
+    return hashlib.sha1(force_bytes(course_id)).hexdigest()
+
+
+def course_id_filter(course_ids):
+    """
+    Filter for courses with any of the given course_ids.
+
+    Goes through the fixed width course_id_hash index, course_id itself
+    isn't indexed. course_id is still matched so a hash collision can't
+    return the wrong course.
+    """
+    return models.Q(
+        course_id_hash__in=[hash_course_id(course_id) for course_id in course_ids],
+        course_id__in=course_ids,
+    )
+
+
+class CourseQuerySet(models.QuerySet):
+    """
+    Queries for courses.
+    """
+    def by_course_id(self, *course_ids):
+        """
+        Courses with any of the given course_ids. See course_id_filter.
+        """
+        return self.filter(course_id_filter(course_ids))
+
+
 @python_2_unicode_compatible
 class Course(models.Model):
     """
     An edX course which is purchasable.
     """
-    uuid = models.UUIDField(default=pyuuid.uuid4, editable=False)
+    uuid = models.UUIDField(default=pyuuid.uuid4, editable=False, db_index=True)
     title = models.CharField(max_length=255)
-    # If course_id lookup is slow, we can hash the contents to do the lookup
-    course_id = models.TextField(help_text="course locator from edx", unique=True)
+    course_id = models.TextField(help_text="course locator from edx")
+    # Unique in place of course_id, whose index grows with its unbounded
+    # length. Kept in step with course_id by save(). See course_id_filter.
+    course_id_hash = models.CharField(max_length=40, editable=False, unique=True)
     author_name = models.CharField(max_length=255, blank=True, null=True)
     overview = models.TextField(blank=True, null=True)
     description = models.TextField(blank=True, null=True)
@@ -47,9 +82,36 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, blank=True)
 
+    # Pre-rendered API representations of the course and its module list.
+    # See courses.snapshots.
+    snapshot = models.TextField(blank=True, null=True, editable=False)
+    modules_snapshot = models.TextField(blank=True, null=True, editable=False)
+    # Digest of what edX last pushed, to skip pushes which change nothing.
+    # See courses.serializers.get_push_fingerprint.
+    push_fingerprint = models.CharField(max_length=40, blank=True, editable=False)
+    # Digest of the chapters module_population last synced the modules to.
+    # See courses.tasks.get_modules_fingerprint.
+    modules_fingerprint = models.CharField(max_length=40, blank=True, editable=False)
+
+    objects = CourseQuerySet.as_manager()
+
+    class Meta:  # pylint: disable=missing-docstring
+        # Backs the keyset pagination of the catalog listing.
+        index_together = (('updated_at', 'id'),)
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):  # pylint: disable=arguments-differ
+        """
+        Updates course_id_hash to match course_id.
+        """
+        self.course_id_hash = hash_course_id(self.course_id)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'course_id' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'course_id_hash'}
+        super(Course, self).save(*args, **kwargs)
+
     def to_webhook(self):
         """
         Webhook serialization
@@ -78,9 +140,14 @@ class Module(models.Model):
     subchapters = JSONField(default=tuple())  # Array of strings.
     locator_id = models.CharField(max_length=255)
     order = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, blank=True, db_index=True)
 
     class Meta:  # pylint: disable=missing-docstring
         ordering = ('course_id', 'order')
+        # module_population looks modules up by locator within their course,
+        # and module lists are read in order.
+        unique_together = (('course', 'locator_id'),)
+        index_together = (('course', 'order'),)
 
     def __str__(self):
         return self.title
@@ -98,6 +165,20 @@ class Module(models.Model):
         }
 
 
+@python_2_unicode_compatible
+class Tombstone(models.Model):
+    """
+    Record of a deleted course or module, so the changes feed can report
+    deletes.
+    """
+    model = models.CharField(max_length=32, help_text="Label of the deleted model, e.g. Course")
+    uuid = models.UUIDField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return "{} {}".format(self.model, self.uuid)
+
+
 @python_2_unicode_compatible
 class UserInfo(models.Model):
     """
@@ -2,11 +2,34 @@
 Tests for Models
 """
 import json
+import re
+
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
 from django.contrib.auth.models import User
 
 from .factories import CourseFactory, ModuleFactory
-from courses.models import Course, Module, UserInfo
+from courses.models import Course, Module, Tombstone, UserInfo, hash_course_id
+
+
+def query_plan(queryset):
+    """
+    The database's query plan for ``queryset``, as one string. Postgres is
+    told to avoid sequential scans, which it would otherwise pick for the
+    handful of rows in a test.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + sql, params)
+        else:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+# Full table scans in SQLite and Postgres query plans.
+re_table_scan = re.compile(r'Seq Scan|SCAN (TABLE )?courses_module')
 # pylint: disable=no-self-use
 
 
@@ -38,6 +61,31 @@ class CourseTests(TestCase):
         assert isinstance(ex_pk, str)
         assert '-' in ex_pk
 
+    def test_course_id_hash_kept_in_step(self):
+        """
+        Saving a course hashes its course_id, including when it changes
+        """
+        course = CourseFactory.create(course_id='course-v1:MITx+8.MReV+2T2016')
+        assert course.course_id_hash == hash_course_id('course-v1:MITx+8.MReV+2T2016')
+        course.course_id = 'course-v1:MITx+8.MReV+3T2016'
+        course.save(update_fields=['course_id'])
+        assert Course.objects.get(pk=course.pk).course_id_hash == hash_course_id(
+            'course-v1:MITx+8.MReV+3T2016')
+
+    def test_by_course_id(self):
+        """
+        Courses are found by course_id through the hash, and only on a full match
+        """
+        first, second = CourseFactory.create(), CourseFactory.create()
+        CourseFactory.create()
+        assert Course.objects.by_course_id(first.course_id).get() == first
+        assert set(Course.objects.by_course_id(first.course_id, second.course_id)) == {
+            first, second}
+        # Same hash, different course_id.
+        Course.objects.filter(pk=first.pk).update(course_id='course-v1:MITx+Other+1T2016')
+        assert not Course.objects.by_course_id(first.course_id).exists()
+        assert not Course.objects.by_course_id('nope').exists()
+
 
 class ModuleTests(TestCase):
     """
@@ -66,6 +114,36 @@ class ModuleTests(TestCase):
 
         assert result == [m10.id, m11.id, m20.id, m21.id]
 
+    def test_locator_id_unique_in_course(self):
+        """
+        A course can't have two modules for the same locator_id
+        """
+        module = ModuleFactory.create()
+        ModuleFactory.create(locator_id=module.locator_id)
+        with transaction.atomic(), self.assertRaises(IntegrityError):
+            ModuleFactory.create(course=module.course, locator_id=module.locator_id)
+
+    def test_lookup_by_locator_id_uses_index(self):
+        """
+        module_population's lookup of a module by course and locator_id
+        doesn't scan the table
+        """
+        module = ModuleFactory.create()
+        plan = query_plan(
+            Module.objects.filter(course=module.course, locator_id=module.locator_id))
+        assert not re_table_scan.search(plan)
+        assert 'locator_id' in plan or 'Index Cond' in plan
+
+    def test_course_modules_read_in_index_order(self):
+        """
+        A course's modules come off an index already in order, without a sort
+        """
+        module = ModuleFactory.create()
+        plan = query_plan(module.course.module_set.all())
+        assert not re_table_scan.search(plan)
+        assert 'TEMP B-TREE' not in plan
+        assert 'Sort' not in plan
+
     def test_towebhook(self):
         """
         test to_webhook implementation returns valid json object
@@ -88,3 +166,15 @@ class UserInfoTests(TestCase):
         Test behavior of str(UserInfo)
         """
         assert str(UserInfo(user=User(username='test'))) == 'Profile for test'
+
+
+class TombstoneTests(TestCase):
+    """
+    Tests for Tombstone
+    """
+    def test_tostring(self):
+        """
+        Test behavior of str(Tombstone)
+        """
+        tombstone = Tombstone(model='Course', uuid='7e0e52d0-3864-11df-81ce-001b631bdd31')
+        assert str(tombstone) == 'Course 7e0e52d0-3864-11df-81ce-001b631bdd31'
@@ -0,0 +1,119 @@
+"""
+Pagination classes for the Course Catalog API
+"""
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _positive_int
+
+
+class CourseCursorPagination(CursorPagination):  # pylint: disable=too-many-instance-attributes
+    """
+    Keyset pagination over ``(updated_at, id)``.
+
+    DRF's CursorPagination only filters on the first ordering field and falls
+    back to an offset for rows sharing that value. Here the cursor position
+    carries both the timestamp and the primary key, so every page is a single
+    indexed range scan and rows inserted or updated while a client is paging
+    land after its cursor instead of shifting the pages it has yet to read.
+    """
+    ordering = ('updated_at', 'id')
+    page_size = settings.COURSE_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.COURSE_MAX_PAGE_SIZE
+
+    def get_page_size(self, request):
+        """
+        Allow clients to ask for a smaller (or, up to max_page_size, larger)
+        page than the default.
+        """
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    # pylint: disable=attribute-defined-outside-init,too-many-branches
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Mostly duped from rest_framework.pagination.CursorPagination, with the
+        position filter swapped for a composite ``(updated_at, id)`` one.
+        """
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by('-updated_at', '-id')
+        else:
+            queryset = queryset.order_by('updated_at', 'id')
+
+        if current_position is not None:
+            updated_at, pk = self._parse_position(current_position)
+            if reverse:
+                queryset = queryset.filter(
+                    Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, id__lt=pk))
+            else:
+                queryset = queryset.filter(
+                    Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+
+        # Always fetch an extra item to determine if there is a following page.
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):  # pylint: disable=unused-argument
+        """
+        Encode both keys so positions are unique per row.
+        """
+        return '{}|{}'.format(instance.updated_at.isoformat(), instance.pk)
+
+    def _parse_position(self, position):
+        """
+        Reverse of _get_position_from_instance.
+        """
+        try:
+            updated_at, pk = position.rsplit('|', 1)
+            updated_at = parse_datetime(updated_at)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if updated_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return updated_at, pk
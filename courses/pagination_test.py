@@ -0,0 +1,96 @@
+"""
+Tests for paging through the course list
+"""
+import json
+
+from django.core.urlresolvers import reverse
+import mock
+
+from courses.factories import CourseFactory
+from courses.models import Course
+from courses.pagination import CourseCursorPagination
+from courses.views_test import ApiTests
+
+
+class CoursePaginationTests(ApiTests):
+    """
+    Tests for keyset pagination of the course list.
+    """
+    def get_page(self, url, **params):
+        """Fetch a page of courses and return the decoded payload"""
+        resp = self.client.get(url, params)
+        assert resp.status_code == 200, resp.content.decode('utf-8')
+        return json.loads(resp.content.decode('utf-8'))
+
+    def walk(self, page_size):
+        """Follow next links from the first page, returning all uuids seen"""
+        seen = []
+        payload = self.get_page(reverse('course-list'), page_size=page_size)
+        while True:
+            assert len(payload['results']) <= page_size
+            seen.extend(course['uuid'] for course in payload['results'])
+            if payload['next'] is None:
+                return seen
+            payload = self.get_page(payload['next'])
+
+    def test_pages_cover_all_courses_once(self):
+        """
+        Following next links should visit each course exactly once in
+        (updated_at, id) order.
+        """
+        courses = [CourseFactory.create() for _ in range(7)]
+        expected = [
+            str(course.uuid) for course in
+            sorted(courses, key=lambda course: (course.updated_at, course.id))
+        ]
+        assert self.walk(page_size=3) == expected
+
+    def test_ties_on_updated_at(self):
+        """
+        Courses sharing an updated_at are still paged without gaps or repeats.
+        """
+        courses = [CourseFactory.create() for _ in range(5)]
+        Course.objects.update(updated_at=courses[0].updated_at)
+        assert self.walk(page_size=2) == [str(course.uuid) for course in courses]
+
+    def test_updated_course_moves_behind_cursor(self):
+        """
+        A course updated while a client is paging shows up at the end rather
+        than shifting the pages the client has yet to read.
+        """
+        courses = [CourseFactory.create() for _ in range(4)]
+        first = self.get_page(reverse('course-list'), page_size=2)
+        courses[0].save()
+        second = self.get_page(first['next'])
+        assert [course['uuid'] for course in second['results']] == [
+            str(courses[2].uuid), str(courses[3].uuid)]
+        third = self.get_page(second['next'])
+        assert [course['uuid'] for course in third['results']] == [str(courses[0].uuid)]
+
+    def test_previous_link(self):
+        """
+        previous links walk back to the same page.
+        """
+        for _ in range(5):
+            CourseFactory.create()
+        first = self.get_page(reverse('course-list'), page_size=2)
+        second = self.get_page(first['next'])
+        back = self.get_page(second['previous'])
+        assert back['results'] == first['results']
+
+    def test_page_size_capped(self):
+        """
+        page_size can't go beyond COURSE_MAX_PAGE_SIZE.
+        """
+        for _ in range(3):
+            CourseFactory.create()
+        with mock.patch.object(CourseCursorPagination, 'max_page_size', 2):
+            payload = self.get_page(reverse('course-list'), page_size=50)
+        assert len(payload['results']) == 2
+
+    def test_invalid_cursor(self):
+        """
+        A garbled cursor is a 404, not a server error.
+        """
+        resp = self.client.get(reverse('course-list'), {'cursor': 'garbage'})
+        assert resp.status_code == 404
@@ -0,0 +1,45 @@
+"""
+Parsers for the Course Catalog API
+"""
+import zlib
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
+from rest_framework.parsers import JSONParser
+import six
+
+
+class GzipJSONParser(JSONParser):
+    """
+    JSONParser which also takes gzip encoded request bodies, for pushes
+    large enough to be worth compressing.
+
+    Decompressed bodies are capped at settings.COURSE_BULK_MAX_BYTES so a
+    small request can't inflate into an unbounded one.
+    """
+    def parse(self, stream, media_type=None, parser_context=None):
+        """
+        Decompresses the incoming bytestream if need be, then parses it as
+        JSON.
+        """
+        parser_context = parser_context or {}
+        request = parser_context.get('request')
+        coding = request.META.get('HTTP_CONTENT_ENCODING', '') if request is not None else ''
+        coding = coding.strip().lower()
+        if coding in ('', 'identity'):
+            return super(GzipJSONParser, self).parse(stream, media_type, parser_context)
+        if coding != 'gzip':
+            raise UnsupportedMediaType(
+                media_type, detail='Unsupported Content-Encoding "{}"'.format(coding))
+
+        # 16 + MAX_WBITS expects a gzip header and trailer.
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = decompressor.decompress(stream.read(), settings.COURSE_BULK_MAX_BYTES + 1)
+        except zlib.error as exc:
+            raise ParseError('gzip decompression error - %s' % six.text_type(exc))
+        if len(data) > settings.COURSE_BULK_MAX_BYTES:
+            raise ParseError('Decompressed body larger than {} bytes'.format(
+                settings.COURSE_BULK_MAX_BYTES))
+        return super(GzipJSONParser, self).parse(
+            six.BytesIO(data), media_type, parser_context)
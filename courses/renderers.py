@@ -0,0 +1,74 @@
+"""
+Renderers for the Course Catalog API
+"""
+import sys
+
+import msgpack
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+import ujson
+
+# ujson walks dicts in the order of their hash table, which is insertion
+# order, and so an OrderedDict's order, only from Python 3.6.
+UJSON_KEEPS_ORDER = sys.version_info >= (3, 6)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer which encodes with ujson for views that opt in, producing
+    the same bytes as the stock renderer.
+
+    ujson formats floats differently and quietly coerces types like dates and
+    lazy strings where the stock encoder would call ``default``, so it's only
+    byte-compatible for strings, ints, bools, None, lists and dicts. Checking
+    that per response would cost more than ujson saves, so instead views
+    whose responses only ever hold those set ``json_native = True``.
+    Everything else (indented output, other views, anything ujson chokes on)
+    goes through JSONRenderer.
+
+    Before Python 3.6 ujson loses the key order of OrderedDicts, so it's
+    only used from then on. Even there it misses move_to_end, which
+    serializers don't use.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into JSON, returning a bytestring.
+        """
+        renderer_context = renderer_context or {}
+        if (data is None or not UJSON_KEEPS_ORDER or
+                not getattr(renderer_context.get('view'), 'json_native', False) or
+                not self.compact or
+                self.get_indent(accepted_media_type, renderer_context) is not None):
+            return super(FastJSONRenderer, self).render(
+                data, accepted_media_type, renderer_context)
+
+        try:
+            ret = ujson.dumps(
+                data, ensure_ascii=self.ensure_ascii, escape_forward_slashes=False)
+        except (OverflowError, TypeError, ValueError):
+            return super(FastJSONRenderer, self).render(
+                data, accepted_media_type, renderer_context)
+
+        # See JSONRenderer.render
+        ret = ret.replace(u'\u2028', u'\\u2028').replace(u'\u2029', u'\\u2029')
+        return bytes(ret.encode('utf-8'))
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renderer which serializes to MessagePack, a compact binary equivalent of
+    JSON. Types MessagePack doesn't have are converted the way the JSON
+    renderer converts them.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into MessagePack, returning a bytestring.
+        """
+        if data is None:
+            return bytes()
+        return msgpack.packb(data, use_bin_type=True, default=JSONEncoder().default)
@@ -0,0 +1,135 @@
+"""
+Tests for API renderers
+"""
+# pylint: disable=no-self-use
+from collections import OrderedDict
+from datetime import datetime
+import json
+import sys
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+import mock
+import msgpack
+from rest_framework.renderers import JSONRenderer
+
+from courses.factories import CourseFactory, EdxAuthorFactory, ModuleFactory
+from courses.renderers import FastJSONRenderer, MessagePackRenderer
+from courses.views import CourseViewSet
+
+# Strings which are easy to encode differently.
+AWKWARD = u'a/b <&> "quoted" \\ \t\n\x00\x1f \u2603 \U0001F600 \u2028\u2029'
+# PostgreSQL text can't hold NUL.
+STORABLE = AWKWARD.replace(u'\x00', u'')
+
+
+class NativeView(object):
+    """Stand-in for a view which opted in to FastJSONRenderer"""
+    json_native = True
+
+
+class FastJSONRendererTests(TestCase):
+    """
+    FastJSONRenderer must render exactly what JSONRenderer does.
+    """
+    def assert_same(self, data, accepted_media_type='application/json', view=NativeView()):
+        """Both renderers produce the same bytes"""
+        context = {'view': view}
+        expected = JSONRenderer().render(data, accepted_media_type, context)
+        assert FastJSONRenderer().render(data, accepted_media_type, context) == expected
+
+    def test_awkward_strings(self):
+        """Escaping matches, including for separators javascript chokes on"""
+        self.assert_same(OrderedDict([
+            ('z', AWKWARD), ('a', [AWKWARD, 1, -2, True, False, None]), (AWKWARD, {}),
+        ]))
+
+    def test_ujson_only_where_it_keeps_order(self):
+        """ujson doesn't keep OrderedDicts' key order before Python 3.6, so isn't used there"""
+        with mock.patch('courses.renderers.ujson', autospec=True) as m_ujson:
+            m_ujson.dumps.return_value = u'{"a":1}'
+            assert FastJSONRenderer().render(
+                {'a': 1}, 'application/json', {'view': NativeView()}) == b'{"a":1}'
+        assert m_ujson.dumps.called == (sys.version_info >= (3, 6))
+
+    def test_key_order(self):
+        """Keys come out in the order the serializer put them in"""
+        keys = [u'{}{}'.format(letter, num) for num in range(20) for letter in u'zyxcba']
+        data = OrderedDict((key, OrderedDict([(u'z', 1), (u'a', 2), (key, 3)])) for key in keys)
+        del data[keys[0]]
+        data[keys[0]] = OrderedDict()
+        rendered = FastJSONRenderer().render(data, 'application/json', {'view': NativeView()})
+        parsed = json.loads(rendered.decode('utf-8'), object_pairs_hook=OrderedDict)
+        assert list(parsed) == keys[1:] + keys[:1]
+        assert [list(value) for value in parsed.values()][:2] == [
+            [u'z', u'a', keys[1]], [u'z', u'a', keys[2]]]
+        self.assert_same(data)
+
+    def test_falls_back(self):
+        """Views which haven't opted in, or data ujson can't encode, go through JSONRenderer"""
+        for data in (
+                {'float': 1e20}, {'when': datetime(2016, 1, 1)}, {'id': uuid.uuid4()},
+                {'big': 2 ** 70}):
+            self.assert_same(data, view=object())
+            self.assert_same(data, view=None)
+        self.assert_same({'big': 2 ** 70})
+
+    def test_catalog_views_opt_in(self):
+        """The catalog viewsets only ever render JSON native data"""
+        assert CourseViewSet.json_native
+
+    def test_indent(self):
+        """Indented output is left to JSONRenderer"""
+        self.assert_same({'a': [1, 2]}, 'application/json; indent=4')
+
+    def test_no_content(self):
+        """None renders to nothing"""
+        self.assert_same(None)
+
+
+class MessagePackRendererTests(TestCase):
+    """
+    Tests for MessagePackRenderer
+    """
+    def test_round_trip(self):
+        """Unpacks to what the JSON renderer would have produced"""
+        data = OrderedDict([
+            ('text', AWKWARD), ('list', [1, None, True]), ('id', uuid.uuid4()),
+            ('when', datetime(2016, 1, 1, 12, 30)),
+        ])
+        packed = MessagePackRenderer().render(data)
+        assert msgpack.unpackb(packed, encoding='utf-8') == json.loads(
+            JSONRenderer().render(data).decode('utf-8'))
+
+    def test_no_content(self):
+        """None renders to nothing"""
+        assert MessagePackRenderer().render(None) == b''
+
+
+class RendererNegotiationTests(TestCase):
+    """
+    The API picks a renderer from the Accept header.
+    """
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('test', password='test')
+        assert self.client.login(username='test', password='test')
+
+    def test_catalog_responses(self):
+        """JSON and MessagePack carry the same catalog"""
+        module = ModuleFactory.create(title=STORABLE)
+        module.course.instructors.add(EdxAuthorFactory.create())
+        CourseFactory.create(title=STORABLE)
+        for url in (
+                reverse('course-list') + '?expand=modules',
+                reverse('module-list', kwargs={'uuid_uuid': module.course.uuid})):
+            as_json = self.client.get(url, HTTP_ACCEPT='application/json')
+            as_msgpack = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+            assert as_json.status_code == as_msgpack.status_code == 200
+            assert as_json['Content-Type'] == 'application/json'
+            assert as_msgpack['Content-Type'] == 'application/msgpack'
+            assert msgpack.unpackb(as_msgpack.content, encoding='utf-8') == json.loads(
+                as_json.content.decode('utf-8'))
@@ -0,0 +1,58 @@
+"""
+Full-text search over the course catalog.
+
+On Postgres this is backed by a GIN index over a weighted tsvector of the
+course's title, author, overview and description (see migration
+0017_course_search_index). Postgres keeps the index up to date on every
+write, and ranks matches with ts_rank. Other databases, which are only used
+for local development and tests, fall back to unranked substring matching.
+"""
+from django.db import connection
+from django.db.models import Q
+
+# Searched fields, with the weights they're ranked by.
+SEARCH_WEIGHTS = (
+    ('title', 'A'),
+    ('author_name', 'B'),
+    ('overview', 'C'),
+    ('description', 'D'),
+)
+# Has to match the indexed expression exactly for Postgres to use the index.
+SEARCH_VECTOR = ' || '.join(
+    "setweight(to_tsvector('english'::regconfig, "
+    "coalesce(\"courses_course\".\"{}\", '')), '{}')".format(field, weight)
+    for field, weight in SEARCH_WEIGHTS
+)
+SEARCH_QUERY = "plainto_tsquery('english'::regconfig, %s)"
+
+
+def search_courses(queryset, terms):
+    """
+    Courses from ``queryset`` matching the search ``terms``, best match
+    first.
+
+    Args:
+        queryset (QuerySet): Courses to search.
+        terms (str): What the user typed.
+
+    Returns:
+        QuerySet: Matching courses.
+    """
+    if connection.vendor == 'postgresql':
+        return queryset.extra(
+            select={'search_rank': 'ts_rank({}, {})'.format(SEARCH_VECTOR, SEARCH_QUERY)},
+            select_params=(terms,),
+            where=['{} @@ {}'.format(SEARCH_VECTOR, SEARCH_QUERY)],
+            params=(terms,),
+            order_by=('-search_rank', 'id'),
+        )
+
+    words = terms.split()
+    if not words:
+        return queryset.none()
+    for word in words:
+        matches = Q()
+        for field, _ in SEARCH_WEIGHTS:
+            matches |= Q(**{'{}__icontains'.format(field): word})
+        queryset = queryset.filter(matches)
+    return queryset.order_by('title', 'id')
@@ -0,0 +1,68 @@
+"""
+Tests for course search
+"""
+import json
+from unittest import skipUnless
+
+from django.core.urlresolvers import reverse
+from django.db import connection
+
+from courses.factories import CourseFactory
+from courses.views_test import ApiTests, course_detail_dict
+
+
+class SearchTests(ApiTests):
+    """
+    Tests for course search. These run against the substring fallback
+    unless the tests are on Postgres.
+    """
+    def search(self, **params):
+        """GET the search endpoint, returning the response"""
+        return self.client.get(reverse('course-search'), params)
+
+    def test_matches_any_field(self):
+        """Title, author, overview and description are all searched"""
+        matches = [
+            CourseFactory.create(title='Classical Mechanics'),
+            CourseFactory.create(author_name='Mechanics Person'),
+            CourseFactory.create(overview='<p>All about mechanics</p>'),
+            CourseFactory.create(description='Quantum mechanics'),
+        ]
+        CourseFactory.create(title='Poetry', author_name='A', overview='B', description='C')
+        resp = self.search(q='mechanics')
+        assert resp.status_code == 200, resp.content.decode('utf-8')
+        payload = json.loads(resp.content.decode('utf-8'))
+        assert sorted(course['uuid'] for course in payload['results']) == sorted(
+            str(course.uuid) for course in matches)
+        assert payload['results'][0] == course_detail_dict(matches[0])
+
+    def test_all_words_must_match(self):
+        """Every word searched for has to appear"""
+        course = CourseFactory.create(title='Classical Mechanics')
+        CourseFactory.create(title='Classical Music')
+        payload = json.loads(self.search(q='classical mechanics').content.decode('utf-8'))
+        assert [result['uuid'] for result in payload['results']] == [str(course.uuid)]
+
+    @skipUnless(connection.vendor == 'postgresql', 'Only Postgres ranks results')
+    def test_title_ranks_first(self):
+        """Title matches outrank matches elsewhere"""
+        by_description = CourseFactory.create(title='Physics', description='mechanics')
+        by_title = CourseFactory.create(title='Mechanics', description='physics')
+        payload = json.loads(self.search(q='mechanics').content.decode('utf-8'))
+        assert [result['uuid'] for result in payload['results']] == [
+            str(by_title.uuid), str(by_description.uuid)]
+
+    def test_limit_and_fields(self):
+        """limit caps the results, and ?fields= still applies"""
+        for _ in range(3):
+            CourseFactory.create(title='Mechanics')
+        payload = json.loads(self.search(q='mechanics', limit=2, fields='title').content.decode(
+            'utf-8'))
+        assert payload['results'] == [{'title': 'Mechanics'}] * 2
+
+    def test_invalid_params(self):
+        """q is required and limit has to be a positive number"""
+        assert self.search().status_code == 400
+        assert self.search(q=' ').status_code == 400
+        assert self.search(q='a', limit='x').status_code == 400
+        assert self.search(q='a', limit=0).status_code == 400
@@ -1,10 +1,14 @@
 """
 Django Rest Framework Serializers for Course API
 """
+import hashlib
+import json
 import logging
 
 from django.core.urlresolvers import reverse
+from django.utils.encoding import force_bytes, force_text
 from rest_framework import serializers
+from rest_framework.fields import empty
 
 from .fields import JsonListField, StringyManyToManyField
 from .models import Course, Module, EdxAuthor
@@ -13,7 +17,110 @@ from oauth_mgmt.models import BackingInstance
 log = logging.getLogger(__name__)
 
 
-class CourseSerializer(serializers.HyperlinkedModelSerializer):
+def get_requested_fields(request, available):
+    """
+    Fields a read request asked for.
+
+    ``?fields=`` is a comma separated list of the fields to include and
+    ``?omit=`` a list of fields to leave out. Unknown names are ignored.
+
+    Args:
+        request (rest_framework.request.Request): The request.
+        available (iterable): Names of all the fields on offer.
+
+    Returns:
+        set: Names of the fields to render.
+    """
+    requested = set(available)
+    if request is None or request.method != 'GET':
+        return requested
+
+    fields = request.query_params.get('fields')
+    if fields:
+        requested &= {name.strip() for name in fields.split(',')}
+    omit = request.query_params.get('omit')
+    if omit:
+        requested -= {name.strip() for name in omit.split(',')}
+    return requested
+
+
+def get_requested_columns(serializer_class, request):
+    """
+    Model columns needed to render the fields a request asked for, for use
+    with ``QuerySet.only()``.
+    """
+    columns = set()
+    for name in get_requested_fields(request, serializer_class.Meta.fields):
+        columns.update(serializer_class.field_columns[name])
+    return columns
+
+
+def get_expansions(request):
+    """
+    Relations a read request asked to have inlined, from the comma separated
+    ``?expand=``.
+
+    Args:
+        request (rest_framework.request.Request): The request.
+
+    Returns:
+        set: Names of the fields to expand.
+    """
+    if request is None or request.method != 'GET':
+        return set()
+    expand = request.query_params.get('expand')
+    if not expand:
+        return set()
+    return {name.strip() for name in expand.split(',')}
+
+
+class SparseFieldsMixin(object):
+    """
+    Drops fields a read request didn't ask for. See get_requested_fields.
+    """
+    def __init__(self, *args, **kwargs):
+        super(SparseFieldsMixin, self).__init__(*args, **kwargs)
+        if self.context.get('nested'):
+            return  # ?fields= is about the outer resource.
+        requested = get_requested_fields(self.context.get('request'), self.fields)
+        for name in set(self.fields) - requested:
+            self.fields.pop(name)
+
+
+def get_push_fingerprint(data):
+    """
+    Digest of course data pushed from edX, for spotting pushes which
+    wouldn't change the course.
+
+    Writable fields are read as CourseSerializer reads them, so form and
+    JSON encodings of the same course match, and instructors are compared
+    as a set.
+
+    Args:
+        data (dict): Pushed data, as prepared by the view.
+
+    Returns:
+        str: Hex digest.
+    """
+    normalized = {}
+    for name, field in CourseSerializer().fields.items():
+        if field.read_only:
+            continue
+        value = field.get_value(data)
+        if value is empty:
+            continue
+        if value is None:
+            pass
+        elif isinstance(field, StringyManyToManyField):
+            value = [value] if not isinstance(value, (list, tuple)) else value
+            value = sorted({force_text(item) for item in value})
+        else:
+            value = force_text(value)
+        normalized[name] = value
+    return hashlib.sha1(force_bytes(json.dumps(normalized, sort_keys=True))).hexdigest()
+
+
+class CourseSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
     """
     Handles the serialization of Course objects.
     """
@@ -35,15 +142,36 @@ class CourseSerializer(serializers.HyperlinkedModelSerializer):
             'url': {'view_name': 'course-detail', 'lookup_field': 'uuid'}
         }
 
+    # Columns each field reads. Relations to select or prefetch are handled
+    # by the view. Hyperlinks are named with str(), so read the title too.
+    field_columns = {
+        'uuid': ('uuid',),
+        'title': ('title',),
+        'author_name': ('author_name',),
+        'overview': ('overview',),
+        'description': ('description',),
+        'image_url': ('image_url',),
+        'edx_instance': ('edx_instance',),
+        'url': ('uuid', 'title'),
+        'modules': ('uuid',),
+        'instructors': (),
+        'course_id': ('course_id',),
+    }
+
     def module_list(self, obj):
         """
-        Builds a url for module listing of this course.
+        Builds a url for module listing of this course, or with
+        ``expand`` containing 'modules' in the context, the modules
+        themselves.
         """
+        if 'modules' in self.context.get('expand', ()):
+            context = dict(self.context, nested=True)
+            return ModuleSerializer(obj.module_set.all(), many=True, context=context).data
         return self.context['request'].build_absolute_uri(
             reverse('module-list', kwargs={'uuid_uuid': obj.uuid}))
 
 
-class ModuleSerializer(serializers.HyperlinkedModelSerializer):
+class ModuleSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
     """
     Handles serialization of Module objects, including ensuring module
     is specific to the requested course.
@@ -62,6 +190,15 @@ class ModuleSerializer(serializers.HyperlinkedModelSerializer):
             'uuid', 'title', 'subchapters', 'course', 'url'
         )
 
+    # Columns each field reads. See CourseSerializer.field_columns.
+    field_columns = {
+        'uuid': ('uuid',),
+        'title': ('title',),
+        'subchapters': ('subchapters',),
+        'course': ('course__uuid', 'course__title'),
+        'url': ('uuid', 'course__uuid'),
+    }
+
     def absolute_url(self, obj):
         """
         Builds absolute url for module instance.
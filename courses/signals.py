@@ -1,11 +1,18 @@
 """
 Signals for Course App
+
+Webhooks and cache invalidation wait for the transaction to commit. Sent
+any sooner, a webhook's task could look the course up before it exists,
+and a read in between could cache the old catalog under the new version.
 """
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
-from courses.models import Course, Module, UserInfo
+from courses.cache import invalidate_catalog
+from courses.models import Course, Module, Tombstone, UserInfo
+from courses.snapshots import refresh_course_snapshot, refresh_modules_snapshot
 from webhooks.tasks import publish_webhook
 
 
@@ -16,10 +23,75 @@ def publish_on_update(sender, instance, **kwargs):
     """
     Trigger publish when course or module saved.
     """
-    publish_webhook.delay(
-        '{}.{}'.format(instance._meta.app_label,
-                       instance._meta.object_name),
-        'uuid', str(instance.uuid))
+    model_str = '{}.{}'.format(instance._meta.app_label, instance._meta.object_name)
+    uuid = str(instance.uuid)
+    transaction.on_commit(lambda: publish_webhook.delay(model_str, 'uuid', uuid))
+
+
+# Snapshot receivers have to be connected before the cache is invalidated,
+# otherwise a read in between could cache an outdated snapshot.
+@receiver(post_save, sender=Course)
+# pylint: disable=unused-argument
+def refresh_snapshots_on_course_save(sender, instance, **kwargs):
+    """
+    Re-render a course's snapshots when it's saved. The module list is
+    included in case the save wrote back an outdated copy of it.
+    """
+    refresh_course_snapshot(instance)
+    refresh_modules_snapshot(instance)
+
+
+@receiver(m2m_changed, sender=Course.instructors.through)
+# pylint: disable=unused-argument
+def refresh_snapshot_on_instructors_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Re-render a course's snapshot when its instructors change.
+    """
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        refresh_course_snapshot(instance)
+    else:
+        courses = Course.objects.select_related('edx_instance')
+        if pk_set is not None:
+            courses = courses.filter(pk__in=pk_set)
+        else:
+            courses = courses.filter(instructors=instance)
+        for course in courses:
+            refresh_course_snapshot(course)
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+# pylint: disable=unused-argument
+def refresh_snapshot_on_module_change(sender, instance, **kwargs):
+    """
+    Re-render a course's module list when one of its modules changes.
+    """
+    refresh_modules_snapshot(instance.course)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Module)
+@receiver(m2m_changed, sender=Course.instructors.through)
+# pylint: disable=unused-argument
+def invalidate_cache_on_update(sender, **kwargs):
+    """
+    Drop cached API responses when anything in the catalog changes.
+    """
+    transaction.on_commit(invalidate_catalog)
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Module)
+# pylint: disable=unused-argument,protected-access
+def record_tombstone(sender, instance, **kwargs):
+    """
+    Remember deleted courses and modules for the changes feed.
+    """
+    Tombstone.objects.create(model=instance._meta.object_name, uuid=instance.uuid)
 
 
 @receiver(post_save, sender=User)
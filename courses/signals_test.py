@@ -8,8 +8,9 @@ from django.contrib.auth.models import User
 from django.test import TestCase
 
 from oauth_mgmt.factories import BackingInstanceFactory
-from courses.models import UserInfo
+from courses.models import Tombstone, UserInfo
 from courses.factories import CourseFactory, ModuleFactory
+from courses.testing import capture_on_commit_callbacks
 
 
 class PublishOnUpdateTests(TestCase):
@@ -23,7 +24,12 @@ class PublishOnUpdateTests(TestCase):
         bi = BackingInstanceFactory.create()
         course = CourseFactory.build(edx_instance=bi)
         with mock.patch('courses.signals.publish_webhook', autospec=True) as wh_mock:
-            course.save()
+            with capture_on_commit_callbacks() as callbacks:
+                course.save()
+            # Not until the course is committed.
+            assert not wh_mock.delay.called
+            for callback in callbacks:
+                callback()
             assert wh_mock.delay.call_count == 1
             args, _ = wh_mock.delay.call_args
             assert args[0] == 'courses.Course'
@@ -37,7 +43,8 @@ class PublishOnUpdateTests(TestCase):
         course = CourseFactory.create()
         module = ModuleFactory.build(course=course)
         with mock.patch('courses.signals.publish_webhook', autospec=True) as wh_mock:
-            module.save()
+            with capture_on_commit_callbacks(execute=True):
+                module.save()
             assert wh_mock.delay.call_count == 1
             args, _ = wh_mock.delay.call_args
             assert args[0] == 'courses.Module'
@@ -45,6 +52,33 @@ class PublishOnUpdateTests(TestCase):
             assert args[2] == str(module.uuid)
 
 
+class TombstoneTests(TestCase):
+    """
+    Tests for recording deletes
+    """
+    def test_course_delete_records_tombstones(self):
+        """
+        Deleting a course records it and its cascaded modules.
+        """
+        module = ModuleFactory.create()
+        course = module.course
+        course.delete()
+        assert sorted(Tombstone.objects.values_list('model', 'uuid')) == sorted([
+            ('Course', course.uuid),
+            ('Module', module.uuid),
+        ])
+
+    def test_module_delete_records_tombstone(self):
+        """
+        Deleting a module records it.
+        """
+        module = ModuleFactory.create()
+        module.delete()
+        tombstone = Tombstone.objects.get()
+        assert tombstone.model == 'Module'
+        assert tombstone.uuid == module.uuid
+
+
 class CreateProfileTests(TestCase):
     """
     Tests for the user profile creation signal.
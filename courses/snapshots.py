@@ -0,0 +1,143 @@
+"""
+Pre-rendered JSON for courses and their module lists.
+
+Snapshots are rendered with the API serializers whenever a course or its
+modules change, and stored on the course row. Absolute urls depend on the
+host a request came in on, so they're rendered against a placeholder origin
+which gets swapped for the real one when the snapshot is served.
+"""
+import json
+
+from django.core.urlresolvers import reverse
+from django.http import HttpRequest, HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .models import Course
+from .serializers import CourseSerializer, ModuleSerializer
+
+SNAPSHOT_ORIGIN = 'https://snapshot.ccxcon.invalid'
+SNAPSHOT_MEDIA_TYPE = 'application/json'
+# Stands in for the results of a paginated response until snapshots are
+# spliced in.
+RESULTS_PLACEHOLDER = '__snapshot_results__'
+
+
+class SnapshotRequest(HttpRequest):
+    """
+    Stand-in request for rendering snapshots outside of a real request.
+    """
+    def build_absolute_uri(self, location=None):
+        """
+        Serializers only ever ask for absolute versions of paths.
+        """
+        return SNAPSHOT_ORIGIN + location
+
+
+def render(data):
+    """
+    Render data the same way the API's JSONRenderer does.
+    """
+    return JSONRenderer().render(data).decode('utf-8')
+
+
+def refresh_course_snapshot(course):
+    """
+    Re-render the snapshot of a single course.
+    """
+    context = {'request': Request(SnapshotRequest())}
+    course.snapshot = render(CourseSerializer(course, context=context).data)
+    Course.objects.filter(pk=course.pk).update(snapshot=course.snapshot)
+    return course.snapshot
+
+
+def refresh_modules_snapshot(course):
+    """
+    Re-render the snapshot of a course's module list.
+    """
+    context = {'request': Request(SnapshotRequest())}
+    modules = course.module_set.select_related('course')
+    course.modules_snapshot = render(
+        ModuleSerializer(modules, many=True, context=context).data)
+    Course.objects.filter(pk=course.pk).update(modules_snapshot=course.modules_snapshot)
+    return course.modules_snapshot
+
+
+def get_course_snapshot(course):
+    """
+    Snapshot of a course, rendering it if it hasn't been yet.
+
+    ``course`` may have been loaded with only its snapshot columns, in which
+    case it is re-fetched in full to render.
+    """
+    if course.snapshot is None:
+        return refresh_course_snapshot(
+            Course.objects.select_related('edx_instance').get(pk=course.pk))
+    return course.snapshot
+
+
+def get_modules_snapshot(course):
+    """
+    Snapshot of a course's module list, rendering it if it hasn't been yet.
+    """
+    if course.modules_snapshot is None:
+        return refresh_modules_snapshot(Course.objects.get(pk=course.pk))
+    return course.modules_snapshot
+
+
+def get_expanded_course_snapshot(course, expansions):
+    """
+    Snapshot of a course with the relations in ``expansions`` inlined.
+
+    The modules url in the course snapshot is swapped for the module list
+    snapshot, which is exactly what the serializer would have nested there.
+    ``course`` needs its uuid and both snapshot columns loaded.
+    """
+    snapshot = get_course_snapshot(course)
+    if 'modules' in expansions:
+        url = SNAPSHOT_ORIGIN + reverse('module-list', kwargs={'uuid_uuid': course.uuid})
+        snapshot = snapshot.replace(json.dumps(url), get_modules_snapshot(course), 1)
+    return snapshot
+
+
+def can_serve_snapshot(request):
+    """
+    Whether the request is for the default representation as plain JSON,
+    which is what snapshots hold.
+    """
+    return (
+        isinstance(request.accepted_renderer, JSONRenderer) and
+        request.accepted_media_type == SNAPSHOT_MEDIA_TYPE and
+        not request.query_params.get('fields') and
+        not request.query_params.get('omit')
+    )
+
+
+def localize(snapshot, request):
+    """
+    Point a snapshot's urls at the host the request came in on.
+    """
+    return snapshot.replace(SNAPSHOT_ORIGIN, request.build_absolute_uri('/').rstrip('/'))
+
+
+def render_list(snapshots, envelope=None):
+    """
+    JSON for a list of snapshots.
+
+    Args:
+        snapshots (list): Snapshot JSON strings.
+        envelope (dict): Optional pagination envelope to wrap the list in,
+            with RESULTS_PLACEHOLDER where the list should go.
+    """
+    results = '[' + ','.join(snapshots) + ']'
+    if envelope is None:
+        return results
+    return render(envelope).replace(json.dumps(RESULTS_PLACEHOLDER), results, 1)
+
+
+def snapshot_response(snapshot, request):
+    """
+    Response for snapshot JSON, byte for byte what the API would have
+    rendered itself.
+    """
+    return HttpResponse(localize(snapshot, request), content_type=SNAPSHOT_MEDIA_TYPE)
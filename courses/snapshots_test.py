@@ -0,0 +1,96 @@
+"""
+Tests for pre-rendered course snapshots
+"""
+# pylint: disable=no-self-use
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from courses.factories import CourseFactory, EdxAuthorFactory, ModuleFactory
+from courses.models import Course
+from courses.snapshots import SNAPSHOT_ORIGIN
+
+
+class SnapshotRefreshTests(TestCase):
+    """
+    Snapshots should follow changes to courses and modules.
+    """
+    def test_course_save(self):
+        """Saving a course re-renders it"""
+        course = CourseFactory.create()
+        course.title = 'changed'
+        course.save()
+        snapshot = json.loads(Course.objects.get(pk=course.pk).snapshot)
+        assert snapshot['title'] == 'changed'
+        assert snapshot['url'].startswith(SNAPSHOT_ORIGIN)
+
+    def test_instructors_change(self):
+        """Changing instructors re-renders the course, from either side"""
+        course = CourseFactory.create()
+        author = EdxAuthorFactory.create()
+        course.instructors.add(author)
+        assert json.loads(Course.objects.get(pk=course.pk).snapshot)['instructors'] == [
+            author.edx_uid]
+        author.course_set.remove(course)
+        assert json.loads(Course.objects.get(pk=course.pk).snapshot)['instructors'] == []
+
+    def test_module_changes(self):
+        """Saving or deleting a module re-renders the course's module list"""
+        module = ModuleFactory.create()
+        snapshot = json.loads(Course.objects.get(pk=module.course.pk).modules_snapshot)
+        assert [m['uuid'] for m in snapshot] == [str(module.uuid)]
+
+        module.delete()
+        assert Course.objects.get(pk=module.course.pk).modules_snapshot == '[]'
+
+
+class SnapshotServingTests(TestCase):
+    """
+    Endpoints should serve snapshots exactly as the serializers would render.
+    """
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('test', password='test')
+        assert self.client.login(username='test', password='test')
+
+    def assert_same_as_serializers(self, url):
+        """
+        Compare the snapshot response with one rendered through the
+        serializers. ``indent=0`` renders identically but skips snapshots.
+        """
+        snapshot = self.client.get(url, HTTP_ACCEPT='application/json')
+        cache.clear()
+        rendered = self.client.get(url, HTTP_ACCEPT='application/json; indent=0')
+        assert snapshot.status_code == rendered.status_code == 200
+        assert snapshot.content == rendered.content
+        assert SNAPSHOT_ORIGIN.encode('utf-8') not in snapshot.content
+
+    def test_endpoints_match_serializers(self):
+        """Each endpoint serves the same bytes either way"""
+        module = ModuleFactory.create(title=u'Unicode \u2603 module')
+        module.course.instructors.add(EdxAuthorFactory.create())
+        CourseFactory.create()
+        for url in (
+                reverse('course-list'),
+                reverse('course-list') + '?page_size=1',
+                reverse('course-list') + '?expand=modules',
+                reverse('course-detail', kwargs={'uuid': module.course.uuid}),
+                reverse('course-detail', kwargs={'uuid': module.course.uuid}) + '?expand=modules',
+                reverse('course-batch') + '?uuid__in={}'.format(module.course.uuid),
+                reverse('module-list', kwargs={'uuid_uuid': module.course.uuid})):
+            self.assert_same_as_serializers(url)
+
+    def test_missing_snapshots_rendered_on_read(self):
+        """Rows without snapshots yet get them rendered when first read"""
+        module = ModuleFactory.create()
+        Course.objects.update(snapshot=None, modules_snapshot=None)
+        self.assert_same_as_serializers(
+            reverse('course-detail', kwargs={'uuid': module.course.uuid}))
+        self.assert_same_as_serializers(
+            reverse('module-list', kwargs={'uuid_uuid': module.course.uuid}))
+        course = Course.objects.get(pk=module.course.pk)
+        assert course.snapshot is not None
+        assert course.modules_snapshot is not None
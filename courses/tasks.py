@@ -1,14 +1,36 @@
 """
 Course Tasks
 """
+from contextlib import closing
+import hashlib
+import json
+import logging
+
 from six.moves.urllib.parse import urljoin  # pylint: disable=import-error
 
-import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, Value, When
+from django.utils.encoding import force_bytes
+from django.utils.timezone import now
 from requests.exceptions import RequestException
 
 from ccxcon.celery import async
-from courses.models import Course, Module
+from ccxcon.http_sessions import get_session
+from courses.blocks import NAMED_TYPES, SUBCHAPTER_DEPTH, has_subchapters, parse_blocks
+from courses.cache import invalidate_catalog
+from courses.models import Course, Module, Tombstone, hash_course_id
+from courses.snapshots import refresh_modules_snapshot
 from oauth_mgmt.utils import get_access_token
+from webhooks.tasks import publish_webhook
+
+log = logging.getLogger(__name__)
+
+# Shared cache markers for a course's module_population, keyed by its
+# course_id hash. See schedule_module_population.
+POPULATION_PENDING_KEY = 'courses:module-population-pending:{}'
+POPULATION_RUNNING_KEY = 'courses:module-population-running:{}'
 
 
 def get_subchapters(module_id, blocks):
@@ -31,59 +53,199 @@ def get_backoff(retries=0):
     return (retries + 1) ** 2 * 60 + 60
 
 
-# pylint: disable=too-many-locals
+def schedule_module_population(course_id):
+    """
+    Queues module_population for a course, unless it's already queued.
+
+    The sync runs settings.MODULE_POPULATION_DELAY seconds later, so a burst
+    of pushes for one course folds into a single blocks API fetch. Pushes
+    arriving once it has started queue another, which picks up anything
+    they changed.
+    """
+    key = POPULATION_PENDING_KEY.format(hash_course_id(course_id))
+    delay = settings.MODULE_POPULATION_DELAY
+    # The marker expires in case the task is lost, so the course isn't stuck
+    # never syncing.
+    if cache.add(key, True, delay + settings.MODULE_POPULATION_TIMEOUT):
+        module_population.apply_async((course_id,), countdown=delay)
+
+
 @async.task(bind=True, max_retries=5)
 def module_population(self, course_id):
     """
-    Gets and persists a list of modules for a given course.
+    Gets and persists a list of modules for a given course. Only one sync
+    of a course runs at a time, a sync started meanwhile is put off.
     """
+    key = hash_course_id(course_id)
+    pending_key = POPULATION_PENDING_KEY.format(key)
+    running_key = POPULATION_RUNNING_KEY.format(key)
+    if not cache.add(running_key, True, settings.MODULE_POPULATION_TIMEOUT):
+        # This stays the course's pending sync, so pushes meanwhile still
+        # fold into it. schedule_module_population would see our own marker
+        # and queue nothing.
+        delay = settings.MODULE_POPULATION_DELAY
+        cache.set(pending_key, True, delay + settings.MODULE_POPULATION_TIMEOUT)
+        module_population.apply_async((course_id,), countdown=delay)
+        return
     try:
-        course = Course.objects.get(course_id=course_id)
+        # Pushes from here on need a sync of their own.
+        cache.delete(pending_key)
+        populate_modules(self, course_id)
+    finally:
+        cache.delete(running_key)
+
+
+# pylint: disable=too-many-locals
+def populate_modules(task, course_id):
+    """
+    Fetches a course's modules from edX and saves them. Retries ``task``
+    if edX can't be reached.
+    """
+    try:
+        course = Course.objects.by_course_id(course_id).get()
     except Course.DoesNotExist:
         return  # delete case.
 
     access_token = get_access_token(course.edx_instance)
+    # Only as deep as the chapters' children, unless that leaves any out.
+    j_resp = fetch_blocks(task, course, access_token, SUBCHAPTER_DEPTH, None)
+    if not has_subchapters(j_resp):
+        log.info("Fetching all blocks of %s, its chapters weren't complete", course_id)
+        j_resp = fetch_blocks(task, course, access_token, 'all', NAMED_TYPES)
+
+    blocks = j_resp['blocks']
+    locations = blocks[j_resp['root']]['children']
+    chapters = [blocks[location] for location in locations]
+    visible_course_ids = {
+        chapter['id'] for chapter in chapters
+        if not chapter.get('visible_to_staff_only')
+    }
+
+    modules = [
+        (payload['id'], num, payload['display_name'], get_subchapters(payload['id'], blocks))
+        for num, payload in enumerate(chapters)
+        if payload['id'] in visible_course_ids
+    ]
+    fingerprint = get_modules_fingerprint(modules)
+    if course.modules_fingerprint == fingerprint:
+        return
+    sync_modules(course, modules)
+    # An update rather than a save, which would re-render the course and
+    # send its webhook.
+    Course.objects.filter(pk=course.pk).update(modules_fingerprint=fingerprint)
+
+
+def get_modules_fingerprint(chapters):
+    """
+    Digest of a course's visible chapters as passed to sync_modules, for
+    spotting syncs which wouldn't change its modules. Hidden chapters are
+    left out of ``chapters`` but still count towards the order of the rest,
+    so visibility changes show up too.
+
+    Returns:
+        str: Hex digest.
+    """
+    return hashlib.sha1(force_bytes(json.dumps(chapters))).hexdigest()
 
+
+def fetch_blocks(task, course, access_token, depth, named_types):
+    """
+    Fetches a course's blocks down to ``depth`` from edX. Retries ``task``
+    if edX can't be reached.
+
+    Returns:
+        dict: The response, keeping the names of only ``named_types`` blocks
+        besides chapters if it was streamed. See parse_blocks.
+    """
+    stream = settings.MODULE_POPULATION_STREAM_BLOCKS
     try:
-        resp = requests.get(
+        resp = get_session('edx').get(
             urljoin(course.edx_instance.instance_url, '/api/courses/v1/blocks/'),
             params={
-                "depth": "all",
+                "depth": depth,
                 "username": course.edx_instance.username,
                 "course_id": course.course_id,
                 "requested_fields": "children,display_name,id,type,visible_to_staff_only",
             }, headers={
                 'Authorization': 'Bearer {}'.format(access_token)
-            })
+            }, stream=stream)
     except RequestException as e:
-        self.retry(exc=e, countdown=get_backoff(self.request.retries))
+        task.retry(exc=e, countdown=get_backoff(task.request.retries))
 
-    if resp.status_code >= 300:
-        self.retry(countdown=get_backoff(self.request.retries))
+    with closing(resp):
+        if resp.status_code >= 300:
+            task.retry(countdown=get_backoff(task.request.retries))
+        if stream:
+            # Undo any Content-Encoding as the body is read.
+            resp.raw.decode_content = True
+            return parse_blocks(resp.raw, named_types)
+        return resp.json()
 
-    j_resp = resp.json()
-    blocks = j_resp['blocks']
-    locations = blocks[j_resp['root']]['children']
-    chapters = [blocks[location] for location in locations]
-    visible_course_ids = {
-        chapter['id'] for chapter in chapters
-        if not chapter.get('visible_to_staff_only')
-    }
 
-    # Delete happens first so we don't have duplicate `order` entries.
-    for module in course.module_set.exclude(locator_id__in=visible_course_ids):
-        module.delete()
-
-    for num, payload in enumerate(chapters):
-        locator_id = payload['id']
-        if locator_id not in visible_course_ids:
-            continue
-
-        try:
-            module = Module.objects.get(course=course, locator_id=locator_id)
-        except Module.DoesNotExist:
-            module = Module(course=course, locator_id=locator_id)
-        module.title = payload['display_name']
-        module.order = num
-        module.subchapters = get_subchapters(module.locator_id, blocks)
-        module.save()
+def sync_modules(course, chapters):
+    """
+    Brings a course's modules in line with ``chapters``, a list of
+    (locator_id, order, title, subchapters) for its visible chapters,
+    touching only the modules which changed.
+
+    Changes are applied in bulk in one transaction, without the per-module
+    save and delete signals. What those would do (tombstones, the modules
+    snapshot, invalidating the cache and webhooks) is done here instead,
+    once per sync.
+    """
+    existing = {module.locator_id: module for module in course.module_set.all()}
+    wanted = {chapter[0] for chapter in chapters}
+    stale = [module for module in existing.values() if module.locator_id not in wanted]
+    created = []
+    updated = []
+    for locator_id, order, title, subchapters in chapters:
+        module = existing.get(locator_id)
+        if module is None:
+            created.append(Module(
+                course=course, locator_id=locator_id, order=order, title=title,
+                subchapters=subchapters))
+        elif (module.order, module.title, module.subchapters) != (order, title, subchapters):
+            module.order, module.title, module.subchapters = order, title, subchapters
+            updated.append(module)
+    if not (stale or created or updated):
+        return
+
+    with transaction.atomic():
+        if stale:
+            model = Module._meta.object_name  # pylint: disable=protected-access
+            Tombstone.objects.bulk_create(
+                Tombstone(model=model, uuid=module.uuid) for module in stale)
+            # Without the post_delete receivers, which would do for each
+            # module what's done here for all of them at once.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'DELETE FROM courses_module WHERE id IN ({})'.format(
+                        ', '.join(['%s'] * len(stale))),
+                    [module.pk for module in stale])
+        if created:
+            Module.objects.bulk_create(created)
+        if updated:
+            update_modules(updated)
+        refresh_modules_snapshot(course)
+    invalidate_catalog()
+    for module in created + updated:
+        publish_webhook.delay('courses.Module', 'uuid', str(module.uuid))
+
+
+def update_modules(modules):
+    """
+    Writes the order, title and subchapters of ``modules`` in one query.
+    """
+    def values(name):
+        """
+        Each module's value for field ``name``.
+        """
+        field = Module._meta.get_field(name)  # pylint: disable=protected-access
+        return Case(*[
+            When(pk=module.pk, then=Value(getattr(module, name), output_field=field))
+            for module in modules
+        ], output_field=field)
+
+    Module.objects.filter(pk__in=[module.pk for module in modules]).update(
+        order=values('order'), title=values('title'), subchapters=values('subchapters'),
+        updated_at=now())
@@ -3,18 +3,68 @@ Module Population Tests
 """
 # pylint: disable=no-self-use,no-value-for-parameter
 from copy import deepcopy
+from io import BytesIO
 import json
 import os
 
 import mock
 import pytest
 from requests.exceptions import RequestException
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from celery.exceptions import Retry
 
-from .tasks import module_population, get_backoff
+from .blocks import SUBCHAPTER_DEPTH
+from .tasks import (
+    POPULATION_PENDING_KEY,
+    POPULATION_RUNNING_KEY,
+    get_backoff,
+    module_population,
+    schedule_module_population,
+    sync_modules,
+)
+from .cache import get_catalog_version
 from .factories import CourseFactory, ModuleFactory
-from .models import Module
+from .models import Course, Module, Tombstone, hash_course_id
+
+
+def mock_blocks_response(m_req, payload):
+    """
+    Makes the mocked requests module respond with ``payload`` from the
+    blocks API, both in full and as a stream.
+    """
+    m_req.get.return_value.status_code = 200
+    m_req.get.return_value.json = lambda: payload
+    m_req.get.return_value.raw = BytesIO(json.dumps(payload).encode('utf-8'))
+
+
+def blocks_response(payload):
+    """
+    A mocked blocks API response with ``payload``, for queuing several up.
+    """
+    resp = mock.MagicMock(status_code=200, raw=BytesIO(json.dumps(payload).encode('utf-8')))
+    resp.json.return_value = payload
+    return resp
+
+
+def to_subchapter_depth(payload):
+    """
+    ``payload`` as the blocks API returns it down to SUBCHAPTER_DEPTH.
+    """
+    blocks = payload['blocks']
+    root = payload['root']
+    kept = {root}
+    for chapter_id in blocks[root]['children']:
+        kept.add(chapter_id)
+        kept.update(blocks[chapter_id].get('children', ()))
+    narrow = deepcopy(payload)
+    narrow['blocks'] = {block_id: narrow['blocks'][block_id] for block_id in kept}
+    for block in narrow['blocks'].values():
+        if block['type'] not in ('course', 'chapter'):
+            block.pop('children', None)
+    return narrow
 
 
 @pytest.mark.parametrize("retries,backoff", [
@@ -56,7 +106,8 @@ class ModulePopulationTests(TestCase):
         Errors doing request should surface the exception.
         """
         course = CourseFactory.create()
-        with mock.patch('courses.tasks.requests', autospec=True) as m_req:
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
             m_req.get.side_effect = RequestException()
 
             with pytest.raises(RequestException):
@@ -67,7 +118,8 @@ class ModulePopulationTests(TestCase):
         non 200 status codes should throw exception and retry.
         """
         course = CourseFactory.create()
-        with mock.patch('courses.tasks.requests', autospec=True) as m_req:
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
             m_req.get.return_value.status_code = 400
 
             with pytest.raises(Retry):
@@ -78,9 +130,9 @@ class ModulePopulationTests(TestCase):
         Modules are created.
         """
         course = CourseFactory.create()
-        with mock.patch('courses.tasks.requests', autospec=True) as m_req:
-            m_req.get.return_value.status_code = 200
-            m_req.get.return_value.json = lambda: self.structure_response
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            mock_blocks_response(m_req, self.structure_response)
 
             module_population(course.course_id)
 
@@ -91,9 +143,9 @@ class ModulePopulationTests(TestCase):
         Submodules are created.
         """
         course = CourseFactory.create()
-        with mock.patch('courses.tasks.requests', autospec=True) as m_req:
-            m_req.get.return_value.status_code = 200
-            m_req.get.return_value.json = lambda: self.structure_response
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            mock_blocks_response(m_req, self.structure_response)
 
             module_population(course.course_id)
 
@@ -110,24 +162,168 @@ class ModulePopulationTests(TestCase):
         """
         course = CourseFactory.create()
         ModuleFactory.create(course=course)
-        with mock.patch('courses.tasks.requests', autospec=True) as m_req:
-            m_req.get.return_value.status_code = 200
-            m_req.get.return_value.json = lambda: {
-                'blocks': {'test': {'children': []}}, 'root': 'test'
-            }
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            mock_blocks_response(m_req, {
+                'blocks': {'test': {'children': [], 'type': 'course'}}, 'root': 'test'
+            })
 
             module_population(course.course_id)
 
             assert Module.objects.count() == 0
 
+    def test_same_modules_without_streaming(self):
+        """
+        Reading the blocks in full gives the same modules as streaming them.
+        """
+        course = CourseFactory.create()
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            mock_blocks_response(m_req, self.structure_response)
+            module_population(course.course_id)
+        streamed = list(course.module_set.values_list('locator_id', 'order', 'title'))
+        streamed_subchapters = [module.subchapters for module in course.module_set.all()]
+        assert m_req.get.call_args[1]['stream'] is True
+
+        course.module_set.all().delete()
+        Course.objects.filter(pk=course.pk).update(modules_fingerprint='')
+        with self.settings(MODULE_POPULATION_STREAM_BLOCKS=False):
+            with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+                m_req = m_session.return_value
+                mock_blocks_response(m_req, self.structure_response)
+                module_population(course.course_id)
+        assert m_req.get.call_args[1]['stream'] is False
+        assert list(course.module_set.values_list('locator_id', 'order', 'title')) == streamed
+        assert [module.subchapters for module in course.module_set.all()] == streamed_subchapters
+
+    def test_fetches_to_subchapter_depth(self):
+        """
+        Only the chapters and their children are asked for when that's all
+        the course has.
+        """
+        course = CourseFactory.create()
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            mock_blocks_response(m_req, to_subchapter_depth(self.structure_response))
+            module_population(course.course_id)
+
+        assert m_req.get.call_count == 1
+        assert m_req.get.call_args[1]['params']['depth'] == SUBCHAPTER_DEPTH
+        module = course.module_set.get(title="Introduction")
+        assert module.subchapters == ["Demo Course Overview"]
+        assert course.module_set.count() == 6
+
+    def test_falls_back_to_all_blocks(self):
+        """
+        All of the course's blocks are fetched if the narrow response leaves
+        out any of the chapters' children.
+        """
+        narrow = to_subchapter_depth(self.structure_response)
+        chapter = narrow['blocks'][narrow['blocks'][narrow['root']]['children'][0]]
+        del narrow['blocks'][chapter['children'][0]]
+
+        course = CourseFactory.create()
+        for stream in (True, False):
+            with self.settings(MODULE_POPULATION_STREAM_BLOCKS=stream):
+                with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+                    m_req = m_session.return_value
+                    m_req.get.side_effect = [
+                        blocks_response(narrow), blocks_response(self.structure_response)]
+                    module_population(course.course_id)
+
+            assert [call[1]['params']['depth'] for call in m_req.get.call_args_list] == [
+                SUBCHAPTER_DEPTH, 'all']
+            module = course.module_set.get(title="Introduction")
+            assert module.subchapters == ["Demo Course Overview"]
+            assert course.module_set.count() == 6
+
+    def test_falls_back_with_other_chapter_children(self):
+        """
+        Chapters' children are named in the full response whatever their
+        type, not just sequentials.
+        """
+        full = {'root': 'c', 'blocks': {
+            'c': {'id': 'c', 'type': 'course', 'children': ['ch']},
+            'ch': {
+                'id': 'ch', 'type': 'chapter', 'display_name': 'Chapter',
+                'children': ['u', 's'],
+            },
+            'u': {'id': 'u', 'type': 'vertical', 'display_name': 'Unit', 'children': ['p']},
+            's': {'id': 's', 'type': 'sequential', 'display_name': 'Seq', 'children': []},
+            'p': {'id': 'p', 'type': 'problem', 'display_name': 'Problem'},
+        }}
+        narrow = to_subchapter_depth(full)
+        del narrow['blocks']['u']
+
+        course = CourseFactory.create()
+        for stream in (True, False):
+            course.module_set.all().delete()
+            Course.objects.filter(pk=course.pk).update(modules_fingerprint='')
+            with self.settings(MODULE_POPULATION_STREAM_BLOCKS=stream):
+                with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+                    m_req = m_session.return_value
+                    m_req.get.side_effect = [blocks_response(narrow), blocks_response(full)]
+                    module_population(course.course_id)
+
+            assert m_req.get.call_args[1]['params']['depth'] == 'all'
+            assert course.module_set.get().subchapters == ['Unit', 'Seq']
+
+    def test_unchanged_structure_skips_sync(self):
+        """
+        Once the modules are synced, a run finding the same chapters leaves
+        the modules alone and sends no webhooks.
+        """
+        course = CourseFactory.create()
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            mock_blocks_response(m_req, self.structure_response)
+            module_population(course.course_id)
+        course.refresh_from_db()
+        assert course.modules_fingerprint
+
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            mock_blocks_response(m_req, self.structure_response)
+            with mock.patch('courses.tasks.publish_webhook', autospec=True) as m_hook:
+                with CaptureQueriesContext(connection) as queries:
+                    module_population(course.course_id)
+        assert not m_hook.delay.called
+        assert not [query for query in queries if 'courses_module' in query['sql']]
+
+    def test_changed_structure_syncs(self):
+        """
+        A new title or a chapter being hidden changes the fingerprint, and
+        the modules are synced again.
+        """
+        course = CourseFactory.create()
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            mock_blocks_response(m_req, self.structure_response)
+            module_population(course.course_id)
+        fingerprints = {Course.objects.get(pk=course.pk).modules_fingerprint}
+
+        blocks = self.structure_response['blocks']
+        chapter_ids = blocks[self.structure_response['root']]['children']
+        blocks[chapter_ids[0]]['display_name'] = 'Renamed'
+        for title, count in (('Renamed', 6), ('Renamed', 5)):
+            with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+                m_req = m_session.return_value
+                mock_blocks_response(m_req, self.structure_response)
+                module_population(course.course_id)
+            fingerprints.add(Course.objects.get(pk=course.pk).modules_fingerprint)
+            assert course.module_set.filter(title=title).exists()
+            assert course.module_set.count() == count
+            blocks[chapter_ids[1]]['visible_to_staff_only'] = True
+        assert len(fingerprints) == 3
+
     def test_module_ordering(self):
         """
         Modules should be ordered based on position in the payload.
         """
         course = CourseFactory.create()
-        with mock.patch('courses.tasks.requests', autospec=True) as m_req:
-            m_req.get.return_value.status_code = 200
-            m_req.get.return_value.json = lambda: self.structure_response
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            mock_blocks_response(m_req, self.structure_response)
 
             module_population(course.course_id)
 
@@ -146,18 +342,18 @@ class ModulePopulationTests(TestCase):
         If modules change order, the db should update accordingly.
         """
         course = CourseFactory.create()
-        with mock.patch('courses.tasks.requests', autospec=True) as m_req:
-            m_req.get.return_value.status_code = 200
-            m_req.get.return_value.json = lambda: self.structure_response
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            mock_blocks_response(m_req, self.structure_response)
 
             # initial population. Known to work via `test_module_ordering`
             module_population(course.course_id)
 
-        with mock.patch('courses.tasks.requests', autospec=True) as m_req:
-            m_req.get.return_value.status_code = 200
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
             resp = self.structure_response.copy()
             resp['blocks'][resp['root']]['children'].sort()
-            m_req.get.return_value.json = lambda: resp
+            mock_blocks_response(m_req, resp)
 
             module_population(course.course_id)
 
@@ -191,9 +387,9 @@ class ModulePopulationTests(TestCase):
             'visible_to_staff_only'] = True
 
         course = CourseFactory.create()
-        with mock.patch('courses.tasks.requests', autospec=True) as m_req:
-            m_req.get.return_value.status_code = 200
-            m_req.get.return_value.json = lambda: response_with_hidden
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            mock_blocks_response(m_req, response_with_hidden)
 
             # initial population. Known to work via `test_module_ordering`
             module_population(course.course_id)
@@ -207,9 +403,9 @@ class ModulePopulationTests(TestCase):
         If some modules are newly marked as hidden, delete them.
         """
         course = CourseFactory.create()
-        with mock.patch('courses.tasks.requests', autospec=True) as m_req:
-            m_req.get.return_value.status_code = 200
-            m_req.get.return_value.json = lambda: self.structure_response
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            mock_blocks_response(m_req, self.structure_response)
 
             # initial population. Known to work via `test_module_ordering`
             module_population(course.course_id)
@@ -222,9 +418,9 @@ class ModulePopulationTests(TestCase):
         response_with_hidden['blocks'][first_module_locator_id][
             'visible_to_staff_only'] = True
 
-        with mock.patch('courses.tasks.requests', autospec=True) as m_req:
-            m_req.get.return_value.status_code = 200
-            m_req.get.return_value.json = lambda: response_with_hidden
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            mock_blocks_response(m_req, response_with_hidden)
 
             # initial population. Known to work via `test_module_ordering`
             module_population(course.course_id)
@@ -232,3 +428,170 @@ class ModulePopulationTests(TestCase):
         # Expect that the hidden module's title is not present
         titles = {module.title for module in course.module_set.all()}
         assert first_module_title not in titles
+
+
+class ScheduleModulePopulationTests(TestCase):
+    """
+    Tests for debouncing module population
+    """
+    def setUp(self):
+        cache.clear()
+        self.course = CourseFactory.create()
+        with open(os.path.join(os.path.dirname(__file__), 'fixtures/course_structure.json')) as f:
+            self.structure_response = json.loads(f.read())
+
+    def populate(self):
+        """
+        Runs module_population for the course against the fixture, returning
+        the requests mock.
+        """
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            mock_blocks_response(m_req, self.structure_response)
+            module_population(self.course.course_id)
+        return m_req
+
+    def test_burst_queues_one_sync(self):
+        """
+        Scheduling a course again before its sync starts doesn't queue another
+        """
+        with mock.patch.object(module_population, 'apply_async', autospec=True) as m_apply:
+            with self.settings(MODULE_POPULATION_DELAY=15):
+                for _ in range(3):
+                    schedule_module_population(self.course.course_id)
+                schedule_module_population('course-v1:other')
+        assert m_apply.call_count == 2
+        m_apply.assert_any_call((self.course.course_id,), countdown=15)
+        m_apply.assert_any_call(('course-v1:other',), countdown=15)
+
+    def test_scheduling_after_sync_starts(self):
+        """
+        Once a course's sync starts, scheduling it queues the next one
+        """
+        with mock.patch.object(module_population, 'apply_async', autospec=True) as m_apply:
+            schedule_module_population(self.course.course_id)
+            self.populate()
+            schedule_module_population(self.course.course_id)
+        assert m_apply.call_count == 2
+        assert Module.objects.count() == 6
+
+    def test_running_sync_puts_off_another(self):
+        """
+        A sync of a course that's already syncing is rescheduled instead of
+        run, and stays pending so pushes meanwhile don't queue another
+        """
+        key = hash_course_id(self.course.course_id)
+        cache.add(POPULATION_RUNNING_KEY.format(key), True)
+        with mock.patch.object(module_population, 'apply_async', autospec=True) as m_apply:
+            # Queued by a push, as it would be.
+            schedule_module_population(self.course.course_id)
+            m_apply.assert_called_once_with((self.course.course_id,), countdown=mock.ANY)
+            m_apply.reset_mock()
+
+            m_req = self.populate()
+            assert not m_req.get.called
+            m_apply.assert_called_once_with((self.course.course_id,), countdown=mock.ANY)
+            assert cache.get(POPULATION_PENDING_KEY.format(key))
+
+            m_apply.reset_mock()
+            schedule_module_population(self.course.course_id)
+            assert not m_apply.called
+
+    def test_lock_released(self):
+        """
+        A sync lets go of the course when it's done, or fails
+        """
+        running_key = POPULATION_RUNNING_KEY.format(hash_course_id(self.course.course_id))
+        self.populate()
+        assert cache.get(running_key) is None
+        with mock.patch('courses.tasks.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
+            m_req.get.side_effect = RequestException()
+            with pytest.raises(RequestException):
+                module_population(self.course.course_id)
+        assert cache.get(running_key) is None
+
+
+class SyncModulesTests(TestCase):
+    """
+    Tests for applying a course's chapters to its modules
+    """
+    def setUp(self):
+        cache.clear()
+        self.course = CourseFactory.create()
+        self.kept = ModuleFactory.create(
+            course=self.course, locator_id='kept', order=0, title='Kept', subchapters=['a'])
+        self.changed = ModuleFactory.create(
+            course=self.course, locator_id='changed', order=1, title='Old', subchapters=['b'])
+        self.stale = ModuleFactory.create(course=self.course, locator_id='stale', order=2)
+        self.other = ModuleFactory.create(locator_id='stale')
+        self.chapters = [
+            ('kept', 0, 'Kept', ['a']),
+            ('changed', 1, 'New', ['b', 'c']),
+            ('new', 3, 'Added', ['d']),
+        ]
+
+    def sync(self, chapters):
+        """
+        Runs sync_modules with webhooks mocked, returning the webhook mock
+        and the queries run.
+        """
+        with mock.patch('courses.tasks.publish_webhook', autospec=True) as mock_hook:
+            with CaptureQueriesContext(connection) as queries:
+                sync_modules(self.course, chapters)
+        return mock_hook, queries
+
+    def test_applies_diff(self):
+        """
+        Modules are added, changed and removed to match the chapters
+        """
+        self.sync(self.chapters)
+        assert [
+            (module.locator_id, module.order, module.title, module.subchapters)
+            for module in self.course.module_set.all()
+        ] == self.chapters
+        assert Module.objects.get(pk=self.changed.pk).uuid == self.changed.uuid
+        assert Module.objects.filter(pk=self.other.pk).exists()
+        assert list(Tombstone.objects.values_list('model', 'uuid')) == [
+            ('Module', self.stale.uuid)]
+
+    def test_only_changes_touched(self):
+        """
+        Only changed modules are written and published, in a handful of queries
+        """
+        kept_updated_at = self.kept.updated_at
+        mock_hook, queries = self.sync(self.chapters)
+        assert Module.objects.get(pk=self.kept.pk).updated_at == kept_updated_at
+        assert Module.objects.get(pk=self.changed.pk).updated_at > self.changed.updated_at
+        new = Module.objects.get(course=self.course, locator_id='new')
+        assert sorted(call[0] for call in mock_hook.delay.call_args_list) == sorted([
+            ('courses.Module', 'uuid', str(self.changed.uuid)),
+            ('courses.Module', 'uuid', str(new.uuid)),
+        ])
+        # Load, tombstone, delete, insert, update, then the snapshot's load
+        # and write, besides savepoints.
+        assert len([
+            query for query in queries.captured_queries
+            if 'SAVEPOINT' not in query['sql']
+        ]) == 7, queries.captured_queries
+
+    def test_refreshes_snapshot_and_cache(self):
+        """
+        The course's modules snapshot is re-rendered and cached responses dropped
+        """
+        version = get_catalog_version()
+        self.sync(self.chapters)
+        snapshot = json.loads(Course.objects.get(pk=self.course.pk).modules_snapshot)
+        assert [module['title'] for module in snapshot] == ['Kept', 'New', 'Added']
+        assert get_catalog_version() != version
+
+    def test_no_changes_no_writes(self):
+        """
+        Nothing is written, published or invalidated when nothing changed
+        """
+        self.sync(self.chapters)
+        version = get_catalog_version()
+        mock_hook, queries = self.sync(self.chapters)
+        assert not mock_hook.delay.called
+        assert len(queries.captured_queries) == 1
+        assert get_catalog_version() == version
@@ -0,0 +1,33 @@
+"""
+Helpers for tests
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextmanager
+def capture_on_commit_callbacks(using=DEFAULT_DB_ALIAS, execute=False):
+    """
+    Collects the transaction.on_commit callbacks registered in the block,
+    which TestCase's transaction never commits to run. Like Django 3.2's
+    TestCase.captureOnCommitCallbacks.
+
+    Args:
+        using (str): Database alias.
+        execute (bool): Run the callbacks when the block exits, as a
+            commit would.
+
+    Yields:
+        list: The callbacks, filled in when the block exits.
+    """
+    callbacks = []
+    connection = connections[using]
+    start = len(connection.run_on_commit)
+    try:
+        yield callbacks
+    finally:
+        callbacks[:] = [func for _, func in connection.run_on_commit[start:]]
+        if execute:
+            for callback in callbacks:
+                callback()
@@ -1,104 +1,670 @@
 """
 Views for powering the Course Catalog API
 """
+from collections import OrderedDict
+from datetime import timedelta
 import logging
+import uuid as pyuuid
 from six.moves.urllib import parse
 
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Prefetch, Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-import requests
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware, now, utc
 from requests.exceptions import RequestException
-from rest_framework import viewsets, serializers, status
-from rest_framework.decorators import api_view
+from rest_framework import generics, viewsets, serializers, status
+from rest_framework.decorators import api_view, list_route
 from rest_framework.mixins import (
     CreateModelMixin,
     ListModelMixin,
     RetrieveModelMixin,
 )
 from rest_framework.response import Response
+import six
 
+from ccxcon.http_sessions import get_session
 from oauth_mgmt.utils import get_access_token, UnretrievableToken
-from .models import Course, Module, EdxAuthor
-from .serializers import CourseSerializer, ModuleSerializer
-from .tasks import module_population
+from .cache import cached_response, conditional_response
+from .models import Course, Module, EdxAuthor, Tombstone, course_id_filter
+from .pagination import CourseCursorPagination
+from .parsers import GzipJSONParser
+from .search import search_courses
+from .serializers import (
+    CourseSerializer,
+    ModuleSerializer,
+    get_expansions,
+    get_push_fingerprint,
+    get_requested_columns,
+    get_requested_fields,
+)
+from .snapshots import (
+    RESULTS_PLACEHOLDER,
+    can_serve_snapshot,
+    get_expanded_course_snapshot,
+    get_modules_snapshot,
+    localize,
+    render_list,
+    snapshot_response,
+)
+from .tasks import schedule_module_population
 
 
 log = logging.getLogger(__name__)
 
+# Outcomes of a course push.
+CREATED = 'created'
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+
+
+def get_updated_since(request):
+    """
+    Parses the ``updated_since`` query parameter.
+
+    Returns:
+        datetime: Timezone aware cutoff, or None if the parameter wasn't given.
+    """
+    value = request.query_params.get('updated_since')
+    if not value:
+        return None
+    try:
+        updated_since = parse_datetime(value)
+    except ValueError:
+        updated_since = None
+    if updated_since is None:
+        raise serializers.ValidationError(
+            {'error': 'updated_since must be an ISO 8601 datetime'})
+    if is_naive(updated_since):
+        updated_since = make_aware(updated_since, utc)
+    return updated_since
+
+
+def filter_updated_since(queryset, request):
+    """
+    Limits a queryset to rows changed since ``updated_since``, if given.
+    """
+    updated_since = get_updated_since(request)
+    if updated_since is not None:
+        queryset = queryset.filter(updated_at__gte=updated_since)
+    return queryset
+
+
+def get_identifiers(request, param):
+    """
+    Values of a list query parameter, given comma separated and/or repeated.
+    Duplicates are dropped, order is kept.
+    """
+    identifiers = OrderedDict()
+    for value in request.query_params.getlist(param):
+        for identifier in value.split(','):
+            identifier = identifier.strip()
+            if identifier:
+                identifiers[identifier] = None
+    return list(identifiers)
+
+
+def get_batch_identifiers(request):
+    """
+    The ``uuid__in`` and ``course_id__in`` identifiers of a batch lookup.
+
+    Returns:
+        tuple: An OrderedDict of the uuids asked for, each mapped to its
+        parsed UUID or None if it isn't one, and the list of course_ids.
+
+    Raises:
+        ValidationError: If there are none, or too many.
+    """
+    uuids = get_identifiers(request, 'uuid__in')
+    course_ids = get_identifiers(request, 'course_id__in')
+    if not uuids and not course_ids:
+        raise serializers.ValidationError(
+            {'error': 'Must provide uuid__in or course_id__in'})
+    if len(uuids) + len(course_ids) > settings.COURSE_BATCH_MAX_SIZE:
+        raise serializers.ValidationError({'error': 'At most {} identifiers allowed'.format(
+            settings.COURSE_BATCH_MAX_SIZE)})
+
+    parsed_uuids = OrderedDict()
+    for value in uuids:
+        try:
+            parsed_uuids[value] = pyuuid.UUID(value)
+        except ValueError:
+            # Can't match anything, so it'll be reported missing.
+            parsed_uuids[value] = None
+    return parsed_uuids, course_ids
+
+
+def match_batch(courses, uuids, course_ids):
+    """
+    Matches the courses found by a batch lookup to the identifiers asked for.
+
+    Args:
+        courses (list): The courses found.
+        uuids (OrderedDict): Each uuid asked for, mapped to its parsed UUID.
+        course_ids (list): The course_ids asked for.
+
+    Returns:
+        tuple: The courses in the order they were asked for, without
+        duplicates, and an OrderedDict of the ``uuid`` and ``course_id``
+        identifiers that didn't match one.
+    """
+    by_uuid = {course.uuid: course for course in courses}
+    by_course_id = {course.course_id: course for course in courses}
+    found = OrderedDict()
+    missing = OrderedDict([('uuid', []), ('course_id', [])])
+    for kind, matches in (
+            ('uuid', [(value, by_uuid.get(parsed)) for value, parsed in uuids.items()]),
+            ('course_id', [(value, by_course_id.get(value)) for value in course_ids])):
+        for value, course in matches:
+            if course is None:
+                missing[kind].append(value)
+            else:
+                found[course.pk] = course
+    return list(found.values()), missing
+
+
+def get_pushing_instance(user):
+    """
+    The edX instance a user pushes courses for.
+
+    Raises:
+        ValidationError: If the user doesn't have one.
+    """
+    if not user.info.edx_instance:
+        log.info("User %s didn't have an associated edx_instance", user)
+        raise serializers.ValidationError("User must have an associated edx_instance.")
+    return user.info.edx_instance
+
+
+def prepare_course_data(data, edx_instance):
+    """
+    A copy of course data pushed from edX, with the edx_instance set and
+    the image_url prefixed with the instance's url.
+
+    Raises:
+        ValidationError: If there's no image_url.
+    """
+    data = data.copy()
+    data['edx_instance'] = edx_instance
+    if not data.get('image_url'):
+        log.info("Didn't specify an image_url")
+        raise serializers.ValidationError("You must specify an image_url")
+    data['image_url'] = parse.urljoin(edx_instance.instance_url, data['image_url'])
+    return data
+
+
+def lock_course(course_id):
+    """
+    The course with ``course_id``, or None, locked until the end of the
+    transaction.
+    """
+    return Course.objects.by_course_id(course_id).select_for_update().first()
+
+
+def iterate_in_batches(queryset, batch_size):
+    """
+    Iterates over a queryset in primary key order, fetching ``batch_size``
+    rows at a time so only one batch is ever held in memory.
+    """
+    last_pk = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size].iterator())
+        if not batch:
+            return
+        for row in batch:
+            yield row
+        last_pk = batch[-1].pk
+
+
+def collection_state(queryset):
+    """
+    Validator state for a list of rows: the latest updated_at, plus the row
+    count to catch deletes.
+    """
+    state = queryset.aggregate(updated_at=Max('updated_at'), count=Count('id'))
+    return state['updated_at'], state['count']
+
+
+def with_modules_state(state, request, modules):
+    """
+    Folds the state of ``modules`` into a course validator state when the
+    request has them inlined, since module changes don't touch the course.
+    """
+    if state is None or 'modules' not in get_expansions(request):
+        return state
+    updated_at, fingerprint = state
+    modules_updated_at, modules_count = collection_state(modules)
+    if updated_at is None or (modules_updated_at is not None and modules_updated_at > updated_at):
+        updated_at = modules_updated_at
+    return updated_at, '{} {}'.format(fingerprint, modules_count)
+
+
+# pylint: disable=unused-argument
+def course_list_state(view, request, *args, **kwargs):
+    """Validator state for the course list"""
+    return with_modules_state(
+        collection_state(Course.objects.all()), request, Module.objects.all())
+
+
+# pylint: disable=unused-argument
+def course_detail_state(view, request, *args, **kwargs):
+    """Validator state for a single course"""
+    try:
+        updated_at = Course.objects.filter(uuid=kwargs['uuid']).values_list(
+            'updated_at', flat=True).first()
+    except (ValueError, ValidationError):
+        return None  # Malformed uuid, let the view 404.
+    if updated_at is None:
+        return None
+    return with_modules_state(
+        (updated_at, None), request, Module.objects.filter(course__uuid=kwargs['uuid']))
+
+
+# pylint: disable=unused-argument
+def module_list_state(view, request, uuid_uuid):
+    """Validator state for the modules of a course"""
+    return collection_state(Module.objects.filter(course__uuid=uuid_uuid))
+
 
 class CourseViewSet(
         CreateModelMixin, ListModelMixin, RetrieveModelMixin, viewsets.GenericViewSet):
     """
     Course API
     """
-    queryset = Course.objects.all()
+    queryset = Course.objects.select_related('edx_instance').prefetch_related(
+        'instructors').defer('snapshot', 'modules_snapshot')
     lookup_field = 'uuid'
     serializer_class = CourseSerializer
+    json_native = True  # See FastJSONRenderer
+    pagination_class = CourseCursorPagination
+
+    def get_queryset(self):
+        """
+        Courses, optionally limited to those changed since a cutoff, loading
+        only what the requested fields need.
+        """
+        fields = get_requested_fields(self.request, CourseSerializer.Meta.fields)
+        columns = get_requested_columns(CourseSerializer, self.request)
+        if self.action == 'batch':
+            # Needed to match courses up with the identifiers asked for.
+            columns |= {'uuid', 'course_id'}
+        queryset = Course.objects.only('id', 'updated_at', *columns)
+        if 'edx_instance' in fields:
+            queryset = queryset.select_related('edx_instance')
+        if 'instructors' in fields:
+            queryset = queryset.prefetch_related('instructors')
+        if 'modules' in fields and 'modules' in get_expansions(self.request):
+            # Modules for the whole page in one query. The prefetch also
+            # fills in module.course, which the module urls need.
+            queryset = queryset.prefetch_related(
+                Prefetch('module_set', queryset=Module.objects.all()))
+        return filter_updated_since(queryset, self.request)
+
+    def get_serializer_context(self):
+        """
+        Lets the serializer know which relations to inline.
+        """
+        context = super(CourseViewSet, self).get_serializer_context()
+        context['expand'] = get_expansions(self.request)
+        return context
+
+    def get_snapshot_queryset(self):
+        """
+        Courses loaded with just what serving their snapshots needs.
+        """
+        columns = ['id', 'uuid', 'course_id', 'updated_at', 'snapshot']
+        if 'modules' in get_expansions(self.request):
+            columns.append('modules_snapshot')
+        return Course.objects.only(*columns)
+
+    def get_snapshot(self, course):
+        """
+        Snapshot of a course from get_snapshot_queryset, expanded as asked.
+        """
+        return get_expanded_course_snapshot(course, get_expansions(self.request))
+
+    @conditional_response(course_list_state)
+    @cached_response
+    def list(self, request, *args, **kwargs):
+        """Paged list of courses, served from their snapshots when possible."""
+        if not can_serve_snapshot(request):
+            return super(CourseViewSet, self).list(request, *args, **kwargs)
+
+        page = self.paginate_queryset(filter_updated_since(self.get_snapshot_queryset(), request))
+        envelope = self.get_paginated_response(RESULTS_PLACEHOLDER).data
+        return snapshot_response(
+            render_list([self.get_snapshot(course) for course in page], envelope), request)
+
+    @conditional_response(course_detail_state)
+    @cached_response
+    def retrieve(self, request, *args, **kwargs):
+        """Single course, served from its snapshot when possible."""
+        if not can_serve_snapshot(request):
+            return super(CourseViewSet, self).retrieve(request, *args, **kwargs)
+
+        course = generics.get_object_or_404(
+            self.get_snapshot_queryset(), uuid=kwargs[self.lookup_field])
+        self.check_object_permissions(request, course)
+        return snapshot_response(self.get_snapshot(course), request)
+
+    @list_route()
+    def batch(self, request):
+        """
+        Courses looked up by ``uuid__in`` and/or ``course_id__in``, in one
+        query. Identifiers that don't match a course are listed under
+        ``missing`` instead of failing the request.
+        """
+        uuids, course_ids = get_batch_identifiers(request)
+        lookup = course_id_filter(course_ids) | Q(
+            uuid__in=[parsed for parsed in uuids.values() if parsed is not None])
+        snapshot = can_serve_snapshot(request)
+        if snapshot:
+            queryset = filter_updated_since(self.get_snapshot_queryset(), request)
+        else:
+            queryset = self.get_queryset()
+        # Results follow the order identifiers were asked for in.
+        found, missing = match_batch(list(queryset.filter(lookup)), uuids, course_ids)
+
+        if snapshot:
+            envelope = OrderedDict([('results', RESULTS_PLACEHOLDER), ('missing', missing)])
+            return snapshot_response(render_list(
+                [self.get_snapshot(course) for course in found], envelope), request)
+        serializer = self.get_serializer(found, many=True)
+        return Response(OrderedDict([('results', serializer.data), ('missing', missing)]))
+
+    @list_route()
+    @cached_response
+    def search(self, request):
+        """
+        Courses matching ``q`` in their title, author, overview or
+        description, best match first. ``limit`` caps how many come back.
+        """
+        terms = request.query_params.get('q', '').strip()
+        if not terms:
+            raise serializers.ValidationError({'error': 'Must provide q'})
+        try:
+            limit = min(int(request.query_params.get('limit', settings.COURSE_SEARCH_LIMIT)),
+                        settings.COURSE_SEARCH_LIMIT)
+        except ValueError:
+            raise serializers.ValidationError({'error': 'limit must be a number'})
+        if limit < 1:
+            raise serializers.ValidationError({'error': 'limit must be positive'})
+
+        if can_serve_snapshot(request):
+            courses = search_courses(
+                filter_updated_since(self.get_snapshot_queryset(), request), terms)[:limit]
+            envelope = {'results': RESULTS_PLACEHOLDER}
+            return snapshot_response(
+                render_list([self.get_snapshot(course) for course in courses], envelope), request)
+        courses = search_courses(self.get_queryset(), terms)[:limit]
+        return Response({'results': self.get_serializer(courses, many=True).data})
+
+    @list_route(methods=['post'], parser_classes=(GzipJSONParser,))
+    def bulk(self, request):  # pylint: disable=too-many-locals
+        """
+        Incoming push of many courses from edX: a JSON array of what create
+        takes, optionally gzip encoded.
+
+        Existing courses are looked up and locked together, and the valid
+        courses are created or updated in one transaction. Each course's outcome is
+        reported in the order they were sent, so one bad course doesn't hold
+        up the rest.
+        """
+        edx_instance = get_pushing_instance(request.user)
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise serializers.ValidationError({'error': 'Must provide a list of courses'})
+        if len(items) > settings.COURSE_BULK_MAX_SIZE:
+            raise serializers.ValidationError({'error': 'At most {} courses allowed'.format(
+                settings.COURSE_BULK_MAX_SIZE)})
+
+        course_ids = [
+            item.get('course_id') for item in items
+            if isinstance(item, dict) and isinstance(item.get('course_id'), six.string_types)
+        ]
+        results = []
+        saved = []
+        seen = set()
+        with transaction.atomic():
+            existing = {
+                course.course_id: course
+                for course in Course.objects.by_course_id(*course_ids).select_for_update()
+            }
+            for item in items:
+                course_id = item.get('course_id') if isinstance(item, dict) else None
+                result = OrderedDict([('course_id', course_id)])
+                results.append(result)
+                try:
+                    if not isinstance(item, dict):
+                        raise serializers.ValidationError("Must be an object.")
+                    instance = None
+                    if isinstance(course_id, six.string_types):
+                        if course_id in seen:
+                            raise serializers.ValidationError(
+                                {'course_id': ["Sent more than once."]})
+                        seen.add(course_id)
+                        instance = existing.get(course_id)
+                    serializer, outcome = self.save_pushed_course(
+                        prepare_course_data(item, edx_instance), instance)
+                except serializers.ValidationError as exc:
+                    result['status'] = 'invalid'
+                    result['errors'] = exc.detail
+                else:
+                    result['status'] = outcome
+                    result['uuid'] = str(serializer.instance.uuid)
+                    if outcome != UNCHANGED:
+                        saved.append(serializer.instance)
+        # Only once the courses are committed, so the tasks can see them.
+        for course in saved:
+            schedule_module_population(course.course_id)
+        return Response({'results': results})
+
+    def save_pushed_course(self, data, instance):
+        """
+        Validates and saves a course pushed from edX over ``instance``, its
+        row locked by the caller, or as a new course if ``instance`` is None.
+
+        Data matching what was last pushed for the course isn't saved at all,
+        sparing the write, webhooks and module resync. If a concurrent push
+        of the same course inserts it first, ours updates that course instead
+        of failing on the unique course_id_hash. Has to be called in a
+        transaction.
+
+        Returns:
+            tuple: The serializer, and CREATED, UPDATED or UNCHANGED.
+
+        Raises:
+            ValidationError: If the data isn't valid.
+        """
+        fingerprint = get_push_fingerprint(data)
+        if instance is not None and instance.push_fingerprint == fingerprint:
+            return self.get_serializer(instance), UNCHANGED
+        serializer = self.get_serializer(instance, data=data)
+        serializer.is_valid(raise_exception=True)
+        if instance is not None:
+            serializer.save(push_fingerprint=fingerprint)
+            return serializer, UPDATED
+        try:
+            with transaction.atomic():
+                serializer.save(push_fingerprint=fingerprint)
+            return serializer, CREATED
+        except IntegrityError:
+            # The savepoint is rolled back, so the transaction carries on.
+            instance = lock_course(data['course_id'])
+            if instance is None:
+                raise
+            return self.save_pushed_course(data, instance)
 
     def create(self, request, *args, **kwargs):
         """
         Incoming call from edX.
 
         Because edX won't know if they've sent the information already or not,
-        this handles the update and create case.
+        this handles the update and create case, as an upsert that concurrent
+        pushes of the same course can't race.
 
         It also does a bit of data preparation, setting the edx_instance from
         the authenticated user and prefixing image paths with this
         edx_instance.
         """
-        user = request.user
-        data = request.data.copy()
-        if not user.info.edx_instance:
-            log.info("User %s didn't have an associated edx_instance", request.user)
-            raise serializers.ValidationError("User must have an associated edx_instance.")
-        data['edx_instance'] = user.info.edx_instance
-
-        if not data.get('image_url'):
-            log.info("Didn't specify an image_url")
-            raise serializers.ValidationError("You must specify an image_url")
-        data['image_url'] = parse.urljoin(
-            user.info.edx_instance.instance_url, data['image_url'])
-
-        # These two if blocks are majoritively copied directly from the source's
-        # underlying mixins. It allows us to overwrite how we get the instance
-        # to update without making a complex `get_object` override. Beyond that,
-        # it allows us to not mutate the request.data object.
-        if Course.objects.filter(course_id=data['course_id']).exists():
-            # Mostly duped from rest_framework.mixins.UpdateModelMixin
-            partial = kwargs.pop('partial', False)
-            instance = Course.objects.get(course_id=data['course_id'])
-            serializer = self.get_serializer(
-                instance, data=data, partial=partial)
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            module_population.delay(serializer.instance.course_id)
-            return Response(serializer.data)
-        else:
-            # Duped from rest_framework.mixins.CreateModelMixin for clarity.
-            serializer = self.get_serializer(data=data)
-            serializer.is_valid(raise_exception=True)
-            self.perform_create(serializer)
-            module_population.delay(serializer.instance.course_id)
+        data = prepare_course_data(request.data, get_pushing_instance(request.user))
+        course_id = data.get('course_id')
+        with transaction.atomic():
+            instance = lock_course(course_id) if course_id else None
+            serializer, outcome = self.save_pushed_course(data, instance)
+        if outcome != UNCHANGED:
+            schedule_module_population(serializer.instance.course_id)
+        if outcome == CREATED:
             headers = self.get_success_headers(serializer.data)
             return Response(
                 serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+        return Response(serializer.data)
 
 
 class ModuleViewSet(ListModelMixin, RetrieveModelMixin, viewsets.GenericViewSet):
     """
     Module API
     """
-    queryset = Module.objects.all()
+    queryset = Module.objects.select_related('course').defer(
+        'course__snapshot', 'course__modules_snapshot')
     lookup_field = 'uuid'
     serializer_class = ModuleSerializer
+    json_native = True  # See FastJSONRenderer
+
+    def get_queryset(self):
+        """
+        Modules, loading only what the requested fields need.
+        """
+        fields = get_requested_fields(self.request, ModuleSerializer.Meta.fields)
+        queryset = Module.objects.only(
+            'id', 'course', *get_requested_columns(ModuleSerializer, self.request))
+        if fields & {'course', 'url'}:
+            queryset = queryset.select_related('course')
+        return queryset
 
+    @conditional_response(module_list_state)
+    @cached_response
     def list(self, request, uuid_uuid):  # pylint: disable=arguments-differ
-        """List of modules filtered by parent course."""
-        modules = self.queryset.filter(course__uuid=uuid_uuid)
+        """
+        List of modules filtered by parent course, served from the course's
+        snapshot when possible.
+        """
+        if get_updated_since(request) is None and can_serve_snapshot(request):
+            try:
+                course = Course.objects.only('id', 'modules_snapshot').get(uuid=uuid_uuid)
+            except (Course.DoesNotExist, ValueError, ValidationError):
+                return snapshot_response(render_list([]), request)
+            return snapshot_response(get_modules_snapshot(course), request)
+
+        modules = filter_updated_since(
+            self.get_queryset().filter(course__uuid=uuid_uuid), request)
         serializer = self.serializer_class(
             modules, many=True, context={'request': request})
         return Response(serializer.data)
 
 
+def get_changes_cutoff(queryset, field, updated_since, until):
+    """
+    Where a page of the changes feed covering ``queryset`` has to end, so
+    it holds about CHANGES_PAGE_SIZE rows changed from ``updated_since``.
+
+    Rows sharing a timestamp always land on the same page, so a client
+    picking up from the cutoff neither skips nor repeats any of them.
+
+    Args:
+        queryset (QuerySet): Rows to page through.
+        field (str): Their change timestamp.
+        updated_since (datetime): Start of the page, inclusive.
+        until (datetime): The furthest the page may reach, exclusive.
+
+    Returns:
+        datetime: End of the page, exclusive.
+    """
+    limit = settings.CHANGES_PAGE_SIZE
+    stamps = list(queryset.filter(**{
+        '{}__gte'.format(field): updated_since,
+        '{}__lt'.format(field): until,
+    }).order_by(field).values_list(field, flat=True)[:limit + 1])
+    if len(stamps) <= limit:
+        return until
+    if stamps[limit] == stamps[0]:
+        # More rows share one timestamp than fit a page. They're sent together.
+        return stamps[0] + timedelta(microseconds=1)
+    return stamps[limit]
+
+
+@api_view()
+def changes(request):
+    """
+    Courses and modules changed or deleted since ``updated_since``.
+
+    Pass the returned ``until`` back as the next ``updated_since``, straight
+    away while ``more`` is true. Each call covers up to the time it was made
+    less CHANGES_FEED_LAG, since rows saved in a transaction carry the time
+    of the save, not of the commit. Changes committed within that lag of
+    being saved are never missed.
+    """
+    updated_since = get_updated_since(request)
+    if updated_since is None:
+        return Response({"error": "Must provide updated_since"}, status=400)
+
+    latest = max(now() - timedelta(seconds=settings.CHANGES_FEED_LAG), updated_since)
+    courses = CourseViewSet.queryset
+    modules = ModuleViewSet.queryset
+    deleted = Tombstone.objects.all()
+    until = min(
+        get_changes_cutoff(courses, 'updated_at', updated_since, latest),
+        get_changes_cutoff(modules, 'updated_at', updated_since, latest),
+        get_changes_cutoff(deleted, 'deleted_at', updated_since, latest),
+    )
+    courses = courses.filter(updated_at__gte=updated_since, updated_at__lt=until)
+    modules = modules.filter(updated_at__gte=updated_since, updated_at__lt=until)
+    deleted = deleted.filter(deleted_at__gte=updated_since, deleted_at__lt=until)
+    context = {'request': request}
+    return Response({
+        # Z rather than +00:00, which would need escaping in a query string.
+        "until": until.isoformat().replace('+00:00', 'Z'),
+        "more": until < latest,
+        "courses": CourseSerializer(
+            courses.order_by('updated_at', 'id'), many=True, context=context).data,
+        "modules": ModuleSerializer(
+            modules.order_by('updated_at', 'id'), many=True, context=context).data,
+        "deleted_courses": [
+            str(uuid) for uuid in deleted.filter(
+                model=Course._meta.object_name  # pylint: disable=protected-access
+            ).values_list('uuid', flat=True)
+        ],
+        "deleted_modules": [
+            str(uuid) for uuid in deleted.filter(
+                model=Module._meta.object_name  # pylint: disable=protected-access
+            ).values_list('uuid', flat=True)
+        ],
+    })
+
+
+@api_view()
+def export(request):
+    """
+    The whole catalog as newline delimited JSON, one course per line with
+    its modules expanded, streamed so memory use doesn't grow with the
+    catalog.
+    """
+    courses = Course.objects.only('id', 'uuid', 'snapshot', 'modules_snapshot')
+
+    def lines():
+        """Each course as a line of JSON"""
+        for course in iterate_in_batches(courses, settings.EXPORT_BATCH_SIZE):
+            yield localize(get_expanded_course_snapshot(course, {'modules'}), request) + '\n'
+
+    return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+
+
 @api_view()
 def user_existence(request):
     """
@@ -173,7 +739,7 @@ def create_ccx(request):
         ]
 
     try:
-        resp = requests.post(
+        resp = get_session('edx').post(
             parse.urljoin(course.edx_instance.instance_url, '/api/ccx/v0/ccx/'),
             json=payload,
             headers={
@@ -0,0 +1,450 @@
+"""
+Tests for the catalog read endpoints: the changes feed, batch lookups,
+exports, field selection and expansion, and their query counts
+"""
+from datetime import timedelta
+import json
+import uuid
+
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+import mock
+
+from courses.factories import CourseFactory, EdxAuthorFactory, ModuleFactory
+from courses.models import Course, Module
+from courses.testing import capture_on_commit_callbacks
+from courses.views_test import ApiTests, COURSE_ID, course_detail_dict, module_detail_dict
+
+
+class QueryBudgetTests(ApiTests):
+    """
+    Read endpoints should cost a constant number of queries no matter how
+    many rows they return.
+    """
+    # Two queries of each budget go to loading the session and its user, and
+    # one to computing the ETag/Last-Modified validators.
+    BUDGETS = {
+        'course-list': 5,
+        'course-detail': 5,
+        'module-list': 4,
+    }
+
+    # Plain JSON is served from snapshots. MessagePack and sparse fields go
+    # through the serializers, and must keep to the budget too.
+    VARIANTS = (
+        ('snapshot', {}, {}),
+        ('msgpack', {}, {'HTTP_ACCEPT': 'application/msgpack'}),
+        ('omit', {'omit': 'title'}, {}),
+    )
+
+    def assert_within_budget(self, name, url):
+        """
+        Fetch url each way and fail if any goes over the named query budget.
+        Returns the number of queries each way.
+        """
+        counts = {}
+        for variant, params, extra in self.VARIANTS:
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.get(url, params, **extra)
+            assert resp.status_code == 200, resp.content.decode('utf-8')
+            assert len(queries) <= self.BUDGETS[name], '{}:\n{}'.format(variant, '\n'.join(
+                query['sql'] for query in queries.captured_queries))
+            counts[variant] = len(queries)
+        return counts
+
+    @staticmethod
+    def make_course():
+        """Course with a few instructors, so relations have something to load"""
+        course = CourseFactory.create()
+        for _ in range(3):
+            course.instructors.add(EdxAuthorFactory.create())
+        return course
+
+    def test_course_list(self):
+        """Listing courses doesn't query per course"""
+        self.make_course()
+        single = self.assert_within_budget('course-list', reverse('course-list'))
+        with capture_on_commit_callbacks(execute=True):
+            for _ in range(9):
+                self.make_course()
+        assert self.assert_within_budget('course-list', reverse('course-list')) == single
+
+    def test_course_detail(self):
+        """Course detail loads its relations up front"""
+        course = self.make_course()
+        self.assert_within_budget(
+            'course-detail', reverse('course-detail', kwargs={'uuid': course.uuid}))
+
+    def test_module_list(self):
+        """Listing modules doesn't query per module"""
+        course = CourseFactory.create()
+        url = reverse('module-list', kwargs={'uuid_uuid': course.uuid})
+        ModuleFactory.create(course=course)
+        single = self.assert_within_budget('module-list', url)
+        with capture_on_commit_callbacks(execute=True):
+            for order in range(1, 10):
+                ModuleFactory.create(course=course, order=order)
+        assert self.assert_within_budget('module-list', url) == single
+
+
+@override_settings(CHANGES_FEED_LAG=0)
+class ChangesFeedTests(ApiTests):
+    """
+    Tests for updated_since filtering and the changes feed.
+    """
+    def get_json(self, url, **params):
+        """GET url and return the decoded payload"""
+        resp = self.client.get(url, params)
+        assert resp.status_code == 200, resp.content.decode('utf-8')
+        return json.loads(resp.content.decode('utf-8'))
+
+    def test_feed_only_returns_changes(self):
+        """Only rows touched after the cursor are returned"""
+        old_module = ModuleFactory.create()
+        until = self.get_json(reverse('changes'), updated_since='2000-01-01T00:00:00Z')['until']
+
+        new_module = ModuleFactory.create()
+        old_module.course.save()
+        payload = self.get_json(reverse('changes'), updated_since=until)
+        assert sorted(course['uuid'] for course in payload['courses']) == sorted(
+            [str(old_module.course.uuid), str(new_module.course.uuid)])
+        assert [module['uuid'] for module in payload['modules']] == [str(new_module.uuid)]
+        assert payload['deleted_courses'] == []
+        assert payload['deleted_modules'] == []
+
+    def test_feed_reports_deletes(self):
+        """Deleted courses and modules show up as tombstones"""
+        module = ModuleFactory.create()
+        course = CourseFactory.create()
+        until = self.get_json(reverse('changes'), updated_since='2000-01-01T00:00:00Z')['until']
+
+        module.delete()
+        course.delete()
+        payload = self.get_json(reverse('changes'), updated_since=until)
+        assert payload['deleted_modules'] == [str(module.uuid)]
+        assert payload['deleted_courses'] == [str(course.uuid)]
+
+    def test_feed_lags_behind(self):
+        """
+        A row saved just before the call, maybe in a transaction yet to
+        commit, is left for the next call
+        """
+        course = CourseFactory.create()
+        Course.objects.filter(id=course.id).update(updated_at=now() - timedelta(seconds=10))
+        with self.settings(CHANGES_FEED_LAG=60):
+            payload = self.get_json(reverse('changes'), updated_since='2000-01-01T00:00:00Z')
+            assert payload['courses'] == []
+            assert not payload['more']
+        payload = self.get_json(reverse('changes'), updated_since=payload['until'])
+        assert [item['uuid'] for item in payload['courses']] == [str(course.uuid)]
+
+    def test_feed_paged(self):
+        """
+        Each call returns at most CHANGES_PAGE_SIZE rows of a kind, and the
+        pages cover every change once
+        """
+        start = now() - timedelta(hours=1)
+        courses = CourseFactory.create_batch(5)
+        for num, course in enumerate(courses):
+            Course.objects.filter(id=course.id).update(updated_at=start + timedelta(seconds=num))
+        modules = [ModuleFactory.create(course=courses[0], order=num) for num in range(3)]
+        Module.objects.filter(id__in=[module.id for module in modules]).update(
+            updated_at=start + timedelta(seconds=1))
+
+        seen_courses, seen_modules = [], []
+        until = '2000-01-01T00:00:00Z'
+        with self.settings(CHANGES_PAGE_SIZE=2):
+            for _ in range(10):
+                payload = self.get_json(reverse('changes'), updated_since=until)
+                assert len(payload['courses']) <= 2
+                seen_courses.extend(item['uuid'] for item in payload['courses'])
+                seen_modules.extend(item['uuid'] for item in payload['modules'])
+                until = payload['until']
+                if not payload['more']:
+                    break
+        assert seen_courses == [str(course.uuid) for course in courses]
+        # More modules share a timestamp than fit a page, so they come at once.
+        assert sorted(seen_modules) == sorted(str(module.uuid) for module in modules)
+
+    def test_feed_requires_updated_since(self):
+        """updated_since is required and must be a datetime"""
+        assert self.client.get(reverse('changes')).status_code == 400
+        resp = self.client.get(reverse('changes'), {'updated_since': 'yesterday'})
+        assert resp.status_code == 400
+
+    def test_course_list_filter(self):
+        """The course list accepts updated_since"""
+        old = CourseFactory.create()
+        new = CourseFactory.create()
+        Course.objects.filter(id=old.id).update(updated_at=old.updated_at - timedelta(days=1))
+        payload = self.get_json(
+            reverse('course-list'), updated_since=new.updated_at.isoformat())
+        assert [course['uuid'] for course in payload['results']] == [str(new.uuid)]
+
+    def test_module_list_filter(self):
+        """The module list accepts updated_since"""
+        old = ModuleFactory.create()
+        new = ModuleFactory.create(course=old.course, order=1)
+        Module.objects.filter(id=old.id).update(updated_at=old.updated_at - timedelta(days=1))
+        payload = self.get_json(
+            reverse('module-list', kwargs={'uuid_uuid': old.course.uuid}),
+            updated_since=new.updated_at.isoformat())
+        assert [module['uuid'] for module in payload] == [str(new.uuid)]
+
+    def test_naive_updated_since(self):
+        """A datetime without a timezone is taken as UTC"""
+        CourseFactory.create()
+        payload = self.get_json(reverse('course-list'), updated_since='2000-01-01T00:00:00')
+        assert len(payload['results']) == 1
+
+
+class SparseFieldsTests(ApiTests):
+    """
+    Tests for ?fields= and ?omit= on read endpoints.
+    """
+    def get(self, url, **params):
+        """GET url, returning the decoded payload and the SQL it ran"""
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url, params)
+        assert resp.status_code == 200, resp.content.decode('utf-8')
+        sql = '\n'.join(query['sql'] for query in queries.captured_queries)
+        return json.loads(resp.content.decode('utf-8')), sql
+
+    def test_course_list_fields(self):
+        """Only the requested fields are rendered or loaded"""
+        course = CourseFactory.create()
+        course.instructors.add(EdxAuthorFactory.create())
+        payload, sql = self.get(reverse('course-list'), fields='uuid,title,course_id')
+        assert payload['results'] == [{
+            'uuid': str(course.uuid),
+            'title': course.title,
+            'course_id': course.course_id,
+        }]
+        assert '"overview"' not in sql
+        assert 'courses_course_instructors' not in sql
+        assert 'oauth_mgmt_backinginstance' not in sql
+
+    def test_course_detail_omit(self):
+        """Omitted fields are neither rendered nor loaded"""
+        course = CourseFactory.create()
+        expected = course_detail_dict(course)
+        for name in ('overview', 'description', 'instructors'):
+            del expected[name]
+        payload, sql = self.get(
+            reverse('course-detail', kwargs={'uuid': course.uuid}),
+            omit='overview,description,instructors')
+        assert payload == expected
+        assert '"description"' not in sql
+        assert 'courses_course_instructors' not in sql
+
+    def test_module_list_fields(self):
+        """Module lists can skip subchapters and the parent course"""
+        module = ModuleFactory.create()
+        payload, sql = self.get(
+            reverse('module-list', kwargs={'uuid_uuid': module.course.uuid}),
+            fields='uuid,title')
+        assert payload == [{'uuid': str(module.uuid), 'title': module.title}]
+        assert '"subchapters"' not in sql
+
+    def test_unknown_fields_ignored(self):
+        """Asking for fields that don't exist doesn't error"""
+        course = CourseFactory.create()
+        payload, _ = self.get(
+            reverse('course-detail', kwargs={'uuid': course.uuid}), fields='uuid,bogus')
+        assert payload == {'uuid': str(course.uuid)}
+
+    def test_writes_ignore_fields(self):
+        """?fields= doesn't drop fields from course pushes"""
+        with mock.patch('courses.views.schedule_module_population', autospec=True):
+            resp = self.client.post(reverse('course-list') + '?fields=uuid', {
+                "title": "title1",
+                "course_id": COURSE_ID,
+                "image_url": "/1",
+            })
+        assert resp.status_code == 201, resp.content
+        assert Course.objects.get().title == 'title1'
+
+
+class ExpandModulesTests(ApiTests):
+    """
+    Tests for ?expand=modules on course endpoints.
+    """
+    def get_json(self, url, **params):
+        """GET url and return the decoded payload"""
+        resp = self.client.get(url, params)
+        assert resp.status_code == 200, resp.content.decode('utf-8')
+        return json.loads(resp.content.decode('utf-8'))
+
+    def test_detail_inlines_ordered_modules(self):
+        """Modules come back in order, as the module list would render them"""
+        course = CourseFactory.create()
+        second = ModuleFactory.create(course=course, order=2)
+        first = ModuleFactory.create(course=course, order=1)
+        payload = self.get_json(
+            reverse('course-detail', kwargs={'uuid': course.uuid}), expand='modules')
+        assert payload['modules'] == [module_detail_dict(first), module_detail_dict(second)]
+        assert payload['modules'] == self.get_json(
+            reverse('module-list', kwargs={'uuid_uuid': course.uuid}))
+
+    def test_list_prefetches_modules(self):
+        """Modules for a whole page of courses are loaded in one query"""
+        for _ in range(5):
+            course = CourseFactory.create()
+            for order in range(3):
+                ModuleFactory.create(course=course, order=order)
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('course-list'), {'expand': 'modules', 'omit': 'title'})
+        assert resp.status_code == 200, resp.content.decode('utf-8')
+        payload = json.loads(resp.content.decode('utf-8'))
+        assert [len(course['modules']) for course in payload['results']] == [3] * 5
+        module_queries = [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "courses_module"' in query['sql'] and 'MAX(' not in query['sql']
+        ]
+        assert len(module_queries) == 1, module_queries
+
+    def test_fields_apply_to_course_only(self):
+        """?fields= trims the course, not the modules inlined in it"""
+        module = ModuleFactory.create()
+        payload = self.get_json(
+            reverse('course-detail', kwargs={'uuid': module.course.uuid}),
+            expand='modules', fields='uuid,modules')
+        assert payload == {
+            'uuid': str(module.course.uuid),
+            'modules': [module_detail_dict(module)],
+        }
+
+    def test_module_change_changes_etag(self):
+        """Module edits invalidate validators of expanded courses"""
+        module = ModuleFactory.create()
+        url = reverse('course-detail', kwargs={'uuid': module.course.uuid})
+        etag = self.client.get(url, {'expand': 'modules'})['ETag']
+        with capture_on_commit_callbacks(execute=True):
+            ModuleFactory.create(course=module.course, order=1)
+        resp = self.client.get(url, {'expand': 'modules'}, HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 200
+        assert len(json.loads(resp.content.decode('utf-8'))['modules']) == 2
+
+    def test_not_expanded_by_default(self):
+        """Without ?expand= modules stay a url"""
+        module = ModuleFactory.create()
+        payload = self.get_json(reverse('course-detail', kwargs={'uuid': module.course.uuid}))
+        assert payload == course_detail_dict(module.course)
+
+
+class BatchLookupTests(ApiTests):
+    """
+    Tests for looking up many courses at once.
+    """
+    def get_batch(self, **params):
+        """GET the batch endpoint, returning the response"""
+        return self.client.get(reverse('course-batch'), params)
+
+    def test_lookup_by_uuid_and_course_id(self):
+        """Courses come back in the order asked for, each once"""
+        first, second, third = [CourseFactory.create() for _ in range(3)]
+        resp = self.get_batch(
+            uuid__in='{},{}'.format(third.uuid, first.uuid),
+            course_id__in=[second.course_id, first.course_id])
+        assert resp.status_code == 200, resp.content.decode('utf-8')
+        payload = json.loads(resp.content.decode('utf-8'))
+        assert payload == {
+            'results': [course_detail_dict(course) for course in (third, first, second)],
+            'missing': {'uuid': [], 'course_id': []},
+        }
+
+    def test_unknown_identifiers_reported(self):
+        """Identifiers without a course are reported rather than a 404"""
+        course = CourseFactory.create()
+        unknown = str(uuid.uuid4())
+        resp = self.get_batch(
+            uuid__in=','.join([str(course.uuid), unknown, 'not-a-uuid']),
+            course_id__in='course-v1:nope')
+        assert resp.status_code == 200, resp.content.decode('utf-8')
+        payload = json.loads(resp.content.decode('utf-8'))
+        assert [result['uuid'] for result in payload['results']] == [str(course.uuid)]
+        assert payload['missing'] == {
+            'uuid': [unknown, 'not-a-uuid'],
+            'course_id': ['course-v1:nope'],
+        }
+
+    def test_single_query(self):
+        """However many identifiers, courses are looked up in one query"""
+        courses = [CourseFactory.create() for _ in range(20)]
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.get_batch(uuid__in=','.join(str(course.uuid) for course in courses))
+        assert resp.status_code == 200, resp.content.decode('utf-8')
+        course_queries = [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "courses_course"' in query['sql']
+        ]
+        assert len(course_queries) == 1, course_queries
+
+    def test_sparse_fields(self):
+        """?fields= applies to batch lookups"""
+        course = CourseFactory.create()
+        resp = self.get_batch(course_id__in=course.course_id, fields='title')
+        assert resp.status_code == 200, resp.content.decode('utf-8')
+        payload = json.loads(resp.content.decode('utf-8'))
+        assert payload['results'] == [{'title': course.title}]
+
+    def test_requires_identifiers(self):
+        """Asking for nothing is an error"""
+        resp = self.get_batch()
+        assert resp.status_code == 400
+
+    def test_too_many_identifiers(self):
+        """Lookups are capped at COURSE_BATCH_MAX_SIZE"""
+        with self.settings(COURSE_BATCH_MAX_SIZE=2):
+            resp = self.get_batch(course_id__in='a,b,c')
+        assert resp.status_code == 400
+
+
+class ExportTests(ApiTests):
+    """
+    Tests for the streaming catalog export.
+    """
+    def export(self):
+        """GET the export, returning each line decoded"""
+        resp = self.client.get(reverse('export'))
+        assert resp.status_code == 200
+        assert resp.streaming
+        assert resp['Content-Type'] == 'application/x-ndjson'
+        content = b''.join(resp.streaming_content).decode('utf-8')
+        assert content == '' or content.endswith('\n')
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_courses_with_modules(self):
+        """Each course is a line, with its modules expanded"""
+        module = ModuleFactory.create()
+        course = CourseFactory.create()
+        first, second = self.export()
+        assert first == dict(course_detail_dict(module.course), modules=[
+            module_detail_dict(module)])
+        assert second == dict(course_detail_dict(course), modules=[])
+
+    def test_fetched_in_batches(self):
+        """Courses are read a batch at a time, each exported once"""
+        courses = [CourseFactory.create() for _ in range(5)]
+        with self.settings(EXPORT_BATCH_SIZE=2):
+            with CaptureQueriesContext(connection) as queries:
+                lines = self.export()
+        assert [line['uuid'] for line in lines] == [str(course.uuid) for course in courses]
+        course_queries = [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "courses_course"' in query['sql']
+        ]
+        # Three batches, then one to find there's nothing left.
+        assert len(course_queries) == 4, course_queries
+
+    def test_empty_catalog(self):
+        """Nothing to export is an empty body"""
+        assert self.export() == []
+
+    def test_requires_authentication(self):
+        """Anonymous users can't export"""
+        self.client.logout()
+        assert self.client.get(reverse('export')).status_code in (401, 403)
@@ -0,0 +1,283 @@
+"""
+Tests for pushing courses to the API, singly and in bulk
+"""
+# pylint: disable=no-self-use
+import gzip
+import json
+import threading
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import Client, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+import mock
+import six
+
+from courses.factories import CourseFactory
+from courses.models import Course
+from courses.testing import capture_on_commit_callbacks
+from courses.views_test import ApiTests, COURSE_ID, course_push
+from oauth_mgmt.factories import BackingInstanceFactory
+
+
+class UnchangedPushTests(ApiTests):
+    """
+    Tests that pushes which don't change a course are skipped.
+    """
+    def post(self, data, **kwargs):
+        """POST a course push, returning the response and the mocked tasks"""
+        with mock.patch('courses.views.schedule_module_population', autospec=True) as mock_pop, \
+                mock.patch('courses.signals.publish_webhook', autospec=True) as mock_hook:
+            with capture_on_commit_callbacks(execute=True):
+                resp = self.client.post(reverse('course-list'), data, **kwargs)
+        return resp, mock_pop, mock_hook
+
+    def test_unchanged_push_skipped(self):
+        """Re-sending a course doesn't write, publish or resync it"""
+        resp, _, _ = self.post(course_push(COURSE_ID))
+        assert resp.status_code == 201, resp.content
+        updated_at = Course.objects.get().updated_at
+
+        with CaptureQueriesContext(connection) as queries:
+            resp, mock_pop, mock_hook = self.post(course_push(COURSE_ID))
+        assert resp.status_code == 200, resp.content
+        assert json.loads(resp.content.decode('utf-8'))['title'] == 'title1'
+        assert not mock_pop.called
+        assert not mock_hook.delay.called
+        assert Course.objects.get().updated_at == updated_at
+        assert not [
+            query['sql'] for query in queries.captured_queries
+            if not query['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE SAVEPOINT'))
+        ]
+
+    def test_encoding_and_instructor_order_ignored(self):
+        """A JSON push matches the same course pushed as a form"""
+        self.post(course_push(COURSE_ID, instructors=['a' * 32, 'b' * 32]))
+        resp, mock_pop, _ = self.post(
+            json.dumps(course_push(COURSE_ID, instructors=['b' * 32, 'a' * 32])),
+            content_type='application/json')
+        assert resp.status_code == 200, resp.content
+        assert not mock_pop.called
+
+    def test_changed_push_saved(self):
+        """Any change to what's pushed updates the course"""
+        self.post(course_push(COURSE_ID))
+        changes = {}
+        for change in ({'title': 'title2'}, {'image_url': '/2.jpg'}, {'instructors': []}):
+            changes.update(change)
+            resp, mock_pop, mock_hook = self.post(course_push(COURSE_ID, **changes))
+            assert resp.status_code == 200, resp.content
+            assert mock_pop.called
+            assert mock_hook.delay.called
+        course = Course.objects.get()
+        assert course.title == 'title2'
+        assert course.image_url == 'https://edx.org/2.jpg'
+        assert not course.instructors.exists()
+
+    def test_unchanged_instructors_not_rewritten(self):
+        """Updating a course leaves instructor links it keeps alone"""
+        self.post(course_push(COURSE_ID, instructors=['a' * 32, 'b' * 32]))
+        with CaptureQueriesContext(connection) as queries:
+            resp, _, _ = self.post(
+                course_push(COURSE_ID, title='title2', instructors=['b' * 32, 'c' * 32]))
+        assert resp.status_code == 200, resp.content
+        writes = [
+            query['sql'] for query in queries.captured_queries
+            if 'courses_course_instructors' in query['sql'] and
+            not query['sql'].startswith('SELECT')
+        ]
+        # Only 'a' unlinked and 'c' linked.
+        assert len(writes) == 2, writes
+        assert sorted(Course.objects.get().instructors.values_list('edx_uid', flat=True)) == [
+            'b' * 32, 'c' * 32]
+
+    def test_bulk_reports_unchanged(self):
+        """Bulk pushes report courses which were skipped"""
+        self.post(course_push(COURSE_ID))
+        with mock.patch('courses.views.schedule_module_population', autospec=True) as mock_pop:
+            resp = self.client.post(
+                reverse('course-bulk'), json.dumps([course_push(COURSE_ID)]),
+                content_type='application/json')
+        assert json.loads(resp.content.decode('utf-8'))['results'][0]['status'] == 'unchanged'
+        assert not mock_pop.called
+
+
+class PushCommitTests(ApiTests):
+    """
+    Tests that webhooks and cache invalidation wait for pushes to commit.
+    """
+    def assert_published_on_commit(self, url, data):
+        """
+        POSTs ``data`` as JSON, checking nothing is published until the
+        transaction commits, then that each course pushed is.
+        """
+        with mock.patch('courses.signals.publish_webhook', autospec=True) as mock_hook:
+            with mock.patch('courses.signals.invalidate_catalog', autospec=True) as mock_inval:
+                with mock.patch('courses.views.schedule_module_population', autospec=True):
+                    with capture_on_commit_callbacks() as callbacks:
+                        resp = self.client.post(
+                            url, json.dumps(data), content_type='application/json')
+                assert resp.status_code in (200, 201), resp.content
+                assert callbacks
+                assert not mock_hook.delay.called
+                assert not mock_inval.called
+
+                for callback in callbacks:
+                    callback()
+                assert sorted(call[0] for call in mock_hook.delay.call_args_list) == sorted(
+                    ('courses.Course', 'uuid', str(uuid))
+                    for uuid in Course.objects.values_list('uuid', flat=True)
+                )
+                assert mock_inval.called
+
+    def test_create_waits_for_commit(self):
+        """
+        Nothing is published for a new course before it's committed, when
+        the webhook could find no course and report it deleted
+        """
+        self.assert_published_on_commit(reverse('course-list'), course_push(COURSE_ID))
+
+    def test_bulk_waits_for_commit(self):
+        """
+        Nothing is published for a bulk push before it's committed
+        """
+        course = CourseFactory.create(edx_instance=self.user.info.edx_instance)
+        self.assert_published_on_commit(reverse('course-bulk'), [
+            course_push('course-v1:MITx+1+1T2016'),
+            course_push(course.course_id, title='Renamed'),
+        ])
+
+
+@skipUnless(connection.vendor == 'postgresql', "Needs concurrent transactions")
+class ConcurrentPushTests(TransactionTestCase):
+    """
+    Tests pushing one course from several clients at once.
+    """
+    def test_parallel_pushes_upsert(self):
+        """
+        Parallel pushes of a new course create it once and update it after
+        """
+        user = User.objects.create_user('test', password='test')
+        user.info.edx_instance = BackingInstanceFactory.create(instance_url='https://edx.org')
+        user.info.save()
+        start = threading.Event()
+        statuses = []
+
+        def push(title):
+            """POST the course once everyone's ready"""
+            try:
+                client = Client()
+                client.force_login(user)
+                start.wait()
+                resp = client.post(reverse('course-list'), course_push(COURSE_ID, title=title))
+                statuses.append(resp.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=push, args=(str(num),)) for num in range(8)]
+        with mock.patch('courses.views.schedule_module_population', autospec=True):
+            for thread in threads:
+                thread.start()
+            start.set()
+            for thread in threads:
+                thread.join()
+
+        assert sorted(statuses) == [200] * 7 + [201]
+        assert Course.objects.count() == 1
+
+
+class BulkPushTests(ApiTests):
+    """
+    Tests for pushing many courses at once.
+    """
+    def push(self, payload, **extra):
+        """POST to the bulk endpoint with module population mocked out"""
+        body = extra.pop('body', None) or json.dumps(payload).encode('utf-8')
+        with mock.patch('courses.views.schedule_module_population', autospec=True) as mock_pop:
+            resp = self.client.post(
+                reverse('course-bulk'), body, content_type='application/json', **extra)
+        return resp, mock_pop
+
+    def test_creates_and_updates(self):
+        """New courses are created, known ones updated, in the order sent"""
+        course = CourseFactory.create(edx_instance=self.user.info.edx_instance)
+        resp, mock_pop = self.push([
+            course_push('course-v1:MITx+1+1T2016'),
+            course_push(course.course_id, title='Renamed'),
+        ])
+        assert resp.status_code == 200, resp.content
+        results = json.loads(resp.content.decode('utf-8'))['results']
+        created = Course.objects.by_course_id('course-v1:MITx+1+1T2016').get()
+        assert results == [
+            {'course_id': 'course-v1:MITx+1+1T2016', 'status': 'created',
+             'uuid': str(created.uuid)},
+            {'course_id': course.course_id, 'status': 'updated', 'uuid': str(course.uuid)},
+        ]
+        assert created.image_url == 'https://edx.org/1.jpg'
+        assert Course.objects.get(pk=course.pk).title == 'Renamed'
+        assert sorted(call[0][0] for call in mock_pop.call_args_list) == sorted([
+            'course-v1:MITx+1+1T2016', course.course_id])
+
+    def test_invalid_items_reported(self):
+        """Invalid courses are reported without holding up the valid ones"""
+        resp, mock_pop = self.push([
+            course_push('course-v1:MITx+1+1T2016', image_url=''),
+            course_push('course-v1:MITx+2+1T2016'),
+            course_push('course-v1:MITx+2+1T2016'),
+            'not a course',
+        ])
+        assert resp.status_code == 200, resp.content
+        results = json.loads(resp.content.decode('utf-8'))['results']
+        assert [result['status'] for result in results] == [
+            'invalid', 'created', 'invalid', 'invalid']
+        assert 'must specify an image_url' in str(results[0]['errors'])
+        assert results[2]['errors'] == {'course_id': ['Sent more than once.']}
+        assert results[3]['course_id'] is None
+        assert list(Course.objects.values_list('course_id', flat=True)) == [
+            'course-v1:MITx+2+1T2016']
+        assert mock_pop.call_count == 1
+
+    def test_gzip_body(self):
+        """Pushes can be gzip encoded"""
+        body = six.BytesIO()
+        with gzip.GzipFile(fileobj=body, mode='wb') as gzipped:
+            gzipped.write(json.dumps([course_push(COURSE_ID)]).encode('utf-8'))
+        resp, _ = self.push(None, body=body.getvalue(), HTTP_CONTENT_ENCODING='gzip')
+        assert resp.status_code == 200, resp.content
+        assert Course.objects.by_course_id(COURSE_ID).exists()
+
+    def test_bad_encodings(self):
+        """Corrupt gzip, oversized bodies and other codings are rejected"""
+        resp, _ = self.push(None, body=b'not gzip', HTTP_CONTENT_ENCODING='gzip')
+        assert resp.status_code == 400
+        resp, _ = self.push([], HTTP_CONTENT_ENCODING='br')
+        assert resp.status_code == 415
+        body = six.BytesIO()
+        with gzip.GzipFile(fileobj=body, mode='wb') as gzipped:
+            gzipped.write(json.dumps([course_push(COURSE_ID)]).encode('utf-8'))
+        with self.settings(COURSE_BULK_MAX_BYTES=10):
+            resp, _ = self.push(None, body=body.getvalue(), HTTP_CONTENT_ENCODING='gzip')
+        assert resp.status_code == 400
+        assert not Course.objects.exists()
+
+    def test_must_be_a_list(self):
+        """The body has to be a non-empty list, within the size limit"""
+        for payload in ({}, []):
+            resp, _ = self.push(payload)
+            assert resp.status_code == 400
+        with self.settings(COURSE_BULK_MAX_SIZE=1):
+            resp, _ = self.push([course_push(COURSE_ID), course_push(COURSE_ID + '2')])
+        assert resp.status_code == 400
+        assert not Course.objects.exists()
+
+    def test_requires_edx_instance(self):
+        """Only users pushing for an edX instance can push"""
+        User.objects.create_user('no-instance', password='test')
+        assert self.client.login(username='no-instance', password='test')
+        resp, _ = self.push([course_push(COURSE_ID)])
+        assert resp.status_code == 400
+        self.client.logout()
+        resp, _ = self.push([course_push(COURSE_ID)])
+        assert resp.status_code in (401, 403)
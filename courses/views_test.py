@@ -4,8 +4,11 @@ import re
 import uuid
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
 import mock
 from requests.exceptions import RequestException
 
@@ -20,6 +23,8 @@ COURSE_ID = "course-locator:$org+$course.$run+branch+$branch+version+$version+ty
 class ApiTests(TestCase):
     """Tests regarding REST API"""
     def setUp(self):
+        # Cached responses outlive the per-test transaction rollback.
+        cache.clear()
         self.user = User.objects.create_user('test', password='test')
         self.user.info.edx_instance = BackingInstanceFactory.create(instance_url='https://edx.org')
         self.user.info.save()
@@ -67,6 +72,19 @@ def module_detail_dict(module):
     }
 
 
+def course_push(course_id, **kwargs):
+    """Helper function to produce a course as edX pushes it"""
+    return dict({
+        "title": "title1",
+        "author_name": "author1",
+        "overview": "overview1",
+        "description": "description1",
+        "image_url": "/1.jpg",
+        "course_id": course_id,
+        "instructors": ["861e87a0803e436b989cb62d5e672c5f"],
+    }, **kwargs)
+
+
 class JsonResponseTests(ApiTests):
     """
     Tests that json responses are what we expect.
@@ -90,7 +108,7 @@ class JsonResponseTests(ApiTests):
         """
         Validate course create endpoint accepts instructors
         """
-        with mock.patch('courses.views.module_population', autospec=True):
+        with mock.patch('courses.views.schedule_module_population', autospec=True):
             resp = self.client.post(reverse('course-list'), {
                 "title": "title1",
                 "author_name": "author1",
@@ -115,7 +133,9 @@ class JsonResponseTests(ApiTests):
         resp = self.client.get(reverse('course-list'))
         assert resp.status_code == 200, resp.content.decode('utf-8')
         course_list = json.loads(resp.content.decode('utf-8'))
-        assert course_list == [course_detail_dict(course)]
+        assert course_list['results'] == [course_detail_dict(course)]
+        assert course_list['next'] is None
+        assert course_list['previous'] is None
 
         # Make sure users not logged in can't list courses
         self.client.logout()
@@ -184,7 +204,7 @@ class JsonResponseTests(ApiTests):
         """
         Ensure we actually call out to module population code.
         """
-        with mock.patch('courses.views.module_population', autospec=True) as mock_pop:
+        with mock.patch('courses.views.schedule_module_population', autospec=True) as mock_pop:
             self.client.post(reverse('course-list'), {
                 "title": "title1",
                 "author_name": "author1",
@@ -198,13 +218,13 @@ class JsonResponseTests(ApiTests):
                     "961e87a0803e436b989cb62d5e672c5f"
                 ]
             })
-            assert mock_pop.delay.called
+            assert mock_pop.called
 
     def test_edx_instance_applied_automatically(self):
         """
         edx_instance applied automatically.
         """
-        with mock.patch('courses.views.module_population', autospec=True):
+        with mock.patch('courses.views.schedule_module_population', autospec=True):
             resp = self.client.post(reverse('course-list'), {
                 "title": "title1",
                 "author_name": "author1",
@@ -227,7 +247,7 @@ class JsonResponseTests(ApiTests):
         """
         User.objects.create_user('no-instance', password='test')
         assert self.client.login(username='no-instance', password='test')
-        with mock.patch('courses.views.module_population', autospec=True):
+        with mock.patch('courses.views.schedule_module_population', autospec=True):
             resp = self.client.post(reverse('course-list'), {
                 "title": "title1",
                 "author_name": "author1",
@@ -247,7 +267,7 @@ class JsonResponseTests(ApiTests):
         """
         image_urls can be just paths.
         """
-        with mock.patch('courses.views.module_population', autospec=True):
+        with mock.patch('courses.views.schedule_module_population', autospec=True):
             resp = self.client.post(reverse('course-list'), {
                 "title": "title1",
                 "author_name": "author1",
@@ -268,7 +288,7 @@ class JsonResponseTests(ApiTests):
         """
         image_urls are still required
         """
-        with mock.patch('courses.views.module_population', autospec=True):
+        with mock.patch('courses.views.schedule_module_population', autospec=True):
             resp = self.client.post(reverse('course-list'), {
                 "title": "title1",
                 "author_name": "author1",
@@ -287,7 +307,7 @@ class JsonResponseTests(ApiTests):
         """
         image_urls are still required even if blank
         """
-        with mock.patch('courses.views.module_population', autospec=True):
+        with mock.patch('courses.views.schedule_module_population', autospec=True):
             resp = self.client.post(reverse('course-list'), {
                 "title": "title1",
                 "author_name": "author1",
@@ -307,7 +327,7 @@ class JsonResponseTests(ApiTests):
         """
         If we post twice with the same course_id, it should trigger an update.
         """
-        with mock.patch('courses.views.module_population', autospec=True):
+        with mock.patch('courses.views.schedule_module_population', autospec=True):
             resp = self.client.post(reverse('course-list'), {
                 "title": "title1",
                 "author_name": "author1",
@@ -336,6 +356,37 @@ class JsonResponseTests(ApiTests):
             self.assertEqual(resp.status_code, 200, resp.content)
             assert Course.objects.count() == 1
 
+    def test_push_existing_course_query_budget(self):
+        """
+        Pushing a known course finds it, locked, in one query
+        """
+        course = CourseFactory.create(edx_instance=self.user.info.edx_instance)
+        with mock.patch('courses.views.schedule_module_population', autospec=True):
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.post(reverse('course-list'), course_push(course.course_id))
+        self.assertEqual(resp.status_code, 200, resp.content)
+        lookups = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and '"course_id_hash" IN' in query['sql']
+        ]
+        assert len(lookups) == 1, lookups
+
+    def test_push_loses_race_to_create(self):
+        """
+        If a concurrent push creates the course after we looked for it, ours
+        updates it instead of failing
+        """
+        course = CourseFactory.create(edx_instance=self.user.info.edx_instance)
+        lock = mock.patch('courses.views.lock_course', autospec=True, side_effect=[None, course])
+        with lock as mock_lock:
+            with mock.patch('courses.views.schedule_module_population', autospec=True):
+                resp = self.client.post(
+                    reverse('course-list'), course_push(course.course_id, title='Renamed'))
+        self.assertEqual(resp.status_code, 200, resp.content)
+        assert mock_lock.call_count == 2
+        assert Course.objects.count() == 1
+        assert Course.objects.get().title == 'Renamed'
+
 
 class UserExistenceTests(ApiTests):
     """Tests validating edx_uid lookups"""
@@ -405,7 +456,8 @@ class CCXCreateTests(ApiTests):
         course = CourseFactory.create()
         self.payload['master_course_id'] = str(course.uuid)
 
-        with mock.patch('courses.views.requests', autospec=True) as mock_req:
+        with mock.patch('courses.views.get_session', autospec=True) as m_session:
+            mock_req = m_session.return_value
             mock_req.post.side_effect = RequestException
 
             result = self.client.post(
@@ -422,7 +474,8 @@ class CCXCreateTests(ApiTests):
         course = CourseFactory.create()
         self.payload['master_course_id'] = str(course.uuid)
 
-        with mock.patch('courses.views.requests', autospec=True) as mock_req:
+        with mock.patch('courses.views.get_session', autospec=True) as m_session:
+            mock_req = m_session.return_value
             mock_req.post.return_value.status_code = 500
             mock_req.post.return_value.json.return_value = {}
 
@@ -442,7 +495,8 @@ class CCXCreateTests(ApiTests):
         seats = 123
         name = "CCX example title"
 
-        with mock.patch('courses.views.requests', autospec=True) as mock_req:
+        with mock.patch('courses.views.get_session', autospec=True) as m_session:
+            mock_req = m_session.return_value
             mock_req.post.return_value.status_code = 201
             mock_req.post.return_value.json.return_value = {}
 
@@ -484,7 +538,8 @@ class CCXCreateTests(ApiTests):
         course_modules = [ModuleFactory(course=course) for _ in range(10)]
         payload['course_modules'] = [str(course_module.uuid) for course_module in course_modules]
 
-        with mock.patch('courses.views.requests', autospec=True) as mock_req:
+        with mock.patch('courses.views.get_session', autospec=True) as m_session:
+            mock_req = m_session.return_value
             mock_req.post.return_value.status_code = 201
             mock_req.post.return_value.json.return_value = {}
 
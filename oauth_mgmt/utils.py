@@ -6,7 +6,8 @@ from six.moves.urllib.parse import urljoin  # pylint: disable=import-error
 
 from six.moves.urllib.parse import urljoin  # pylint: disable=import-error
 from django.utils.timezone import now
-import requests
+
+from ccxcon.http_sessions import get_session
 
 
 class UnretrievableToken(Exception):
@@ -47,7 +48,7 @@ def get_access_token(instance):
             "refresh_token": instance.refresh_token,
         }
 
-    resp = requests.post(
+    resp = get_session('edx').post(
         urljoin(instance.instance_url, '/oauth2/access_token/'),
         data=params)
     if resp.status_code >= 300:
@@ -42,7 +42,8 @@ class GetAccessTokenTests(TestCase):
             grant_token='qwerty')
         assert bi.is_expired
 
-        with mock.patch('oauth_mgmt.utils.requests', autospec=True) as m_req:
+        with mock.patch('oauth_mgmt.utils.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
             m_req.post.return_value.status_code = 500
             with pytest.raises(UnretrievableToken):
                 get_access_token(bi)
@@ -62,7 +63,8 @@ class GetAccessTokenTests(TestCase):
             "scope": ""
         }
 
-        with mock.patch('oauth_mgmt.utils.requests', autospec=True) as m_req:
+        with mock.patch('oauth_mgmt.utils.get_session', autospec=True) as m_session:
+            m_req = m_session.return_value
             m_req.post.return_value.content = json.dumps(payload)
             m_req.post.return_value.json = lambda: json.loads(m_req.post.return_value.content)
             m_req.post.return_value.status_code = 200
@@ -101,7 +103,8 @@ class GetAccessTokenTests(TestCase):
             "scope": ""
         }
 
-        with mock.patch('oauth_mgmt.utils.requests.post', autospec=True) as m_post:
+        with mock.patch('oauth_mgmt.utils.get_session', autospec=True) as m_session:
+            m_post = m_session.return_value.post
             m_post.return_value.status_code = 200
             m_post.return_value.json = lambda: payload
             m_post.return_value.content = json.dumps(payload)
@@ -9,11 +9,11 @@ import logging
 from django.apps import apps
 from django.core.exceptions import FieldError
 from django.utils.encoding import force_bytes
-import requests
 from requests.exceptions import RequestException
 from rest_framework.status import HTTP_200_OK
 
 from ccxcon.celery import async
+from ccxcon.http_sessions import get_session
 from webhooks.models import Webhook
 
 log = logging.getLogger(__name__)
@@ -84,7 +84,7 @@ def publish_webhook(model_str, lookup_field, lookup_value):
                                  hashlib.sha1).hexdigest()
             log.debug("Posting payload with signature %s. Payload: %s", signature, j_payload)
             # NOTE: Using the non-stringy version, given we're posting this as json.
-            resp = requests.post(wh.url, json=payload, headers={
+            resp = get_session('webhooks').post(wh.url, json=payload, headers={
                 'X-CCXCon-Signature': signature
             })
             if resp.status_code != HTTP_200_OK:
@@ -45,13 +45,15 @@ class PublishWebhookTests(TestCase):
         """
         WebhookFactory.create(url="http://example.org")
         course = CourseFactory.create()
-        with mock.patch('webhooks.tasks.requests', autospec=True) as mock_requests:
+        with mock.patch('webhooks.tasks.get_session', autospec=True) as m_session:
+            mock_requests = m_session.return_value
             publish_webhook('courses.Course', 'pk', course.pk)
             assert mock_requests.post.call_count == 1
             _, kwargs = mock_requests.post.call_args
             payload = kwargs['json']
             assert isinstance(payload, dict)
             assert payload['action'] == 'update'
+            m_session.assert_called_with('webhooks')
 
     def test_no_post_if_no_webhook_method(self):
         """
@@ -59,7 +61,8 @@ class PublishWebhookTests(TestCase):
         """
         WebhookFactory.create(url="http://example.org")
         user = User.objects.create()
-        with mock.patch('webhooks.tasks.requests', autospec=True) as mock_requests:
+        with mock.patch('webhooks.tasks.get_session', autospec=True) as m_session:
+            mock_requests = m_session.return_value
             publish_webhook('auth.User', 'pk', user.pk)
             assert mock_requests.post.call_count == 0
 
@@ -68,7 +71,8 @@ class PublishWebhookTests(TestCase):
         If there's no model, send a delete.
         """
         WebhookFactory.create(url="http://example.org")
-        with mock.patch('webhooks.tasks.requests', autospec=True) as mock_requests:
+        with mock.patch('webhooks.tasks.get_session', autospec=True) as m_session:
+            mock_requests = m_session.return_value
             publish_webhook('courses.Course', 'pk', 1)
             assert mock_requests.post.call_count == 1
             _, kwargs = mock_requests.post.call_args
@@ -80,7 +84,8 @@ class PublishWebhookTests(TestCase):
         """
         wh = WebhookFactory.create(url="http://example.org")
         course = CourseFactory.create()
-        with mock.patch('webhooks.tasks.requests', autospec=True) as mock_requests:
+        with mock.patch('webhooks.tasks.get_session', autospec=True) as m_session:
+            mock_requests = m_session.return_value
             publish_webhook('courses.Course', 'pk', course.pk)
             assert mock_requests.post.call_count == 1
             _, kwargs = mock_requests.post.call_args
@@ -100,7 +105,8 @@ class PublishWebhookTests(TestCase):
         WebhookFactory.create(url="http://example.org")
         WebhookFactory.create(url="http://example.com")
         course = CourseFactory.create()
-        with mock.patch('webhooks.tasks.requests', autospec=True) as mock_requests:
+        with mock.patch('webhooks.tasks.get_session', autospec=True) as m_session:
+            mock_requests = m_session.return_value
             response = Response()
             response._content = b""  # pylint: disable=protected-access
             response.status_code = 400
@@ -114,7 +120,8 @@ class PublishWebhookTests(TestCase):
         """
         WebhookFactory.create(url="http://example.org")
         course = CourseFactory.create()
-        with mock.patch('webhooks.tasks.requests', autospec=True) as mock_requests:
+        with mock.patch('webhooks.tasks.get_session', autospec=True) as m_session:
+            mock_requests = m_session.return_value
             publish_webhook('courses.Course', 'uuid', course.uuid)
             assert mock_requests.post.call_count == 1
 
@@ -124,6 +131,6 @@ class PublishWebhookTests(TestCase):
         """
         WebhookFactory.create(url="http://example.org")
         course = CourseFactory.create()
-        with mock.patch('webhooks.tasks.requests', autospec=True):
+        with mock.patch('webhooks.tasks.get_session', autospec=True):
             with pytest.raises(FieldError):
                 publish_webhook('courses.Course', 'asdf', course.pk)